@@ -0,0 +1,547 @@
+import gc
+import os
+import sys
+import time
+import types
+import argparse
+import collections
+import subprocess
+import resource
+import threading
+import multiprocessing
+
+from evdev import UInputError, ecodes as e
+
+from ghost_core import SLEEPERS, BASE_KEYS, EV_PRESS, GhostEngine, latency_text, ControlChannel, RecordingSink, BatchedUInputSink, create_uinput, percentile
+from event_trace import EventTrace
+from input_listener import GlobalListener, INPUT_EVENT
+from engine_main import engine_command
+
+BASE_CONFIG = {
+    'mode': 'mouse',
+    'rand': 1,
+    'jitter': 2.0,
+    'target_btn': -1,
+    'assist_wtap': False,
+    'assist_wtap_chance': 5.0,
+    'assist_blockhit': False,
+    'assist_blockhit_chance': 5.0,
+    'precision_left': False,
+    'precision_right': False,
+    'precision_overrun': 'skip',
+}
+
+ENGINE_SCENARIOS = [
+    ("left 8", {'cps_left': 8.0}, ["ENABLE_LEFT"]),
+    ("left 14", {'cps_left': 14.0}, ["ENABLE_LEFT"]),
+    ("left 20", {'cps_left': 20.0}, ["ENABLE_LEFT"]),
+    ("right 20", {'cps_right': 20.0}, ["ENABLE_RIGHT"]),
+    ("both 12", {'cps_left': 12.0, 'cps_right': 12.0}, ["ENABLE_LEFT", "ENABLE_RIGHT"]),
+    ("both 20", {'cps_left': 20.0, 'cps_right': 20.0}, ["ENABLE_LEFT", "ENABLE_RIGHT"]),
+    ("both 20 assists", {'cps_left': 20.0, 'cps_right': 20.0, 'assist_wtap': True, 'assist_wtap_chance': 30.0,
+                         'assist_blockhit': True, 'assist_blockhit_chance': 30.0}, ["ENABLE_LEFT", "ENABLE_RIGHT"]),
+    ("fixed 100 Hz", {'precision_left': True, 'precision_hz_left': 100.0}, ["ENABLE_LEFT"]),
+    ("fixed 1k skip", {'precision_left': True, 'precision_hz_left': 1000.0}, ["ENABLE_LEFT"]),
+    ("fixed 1k catchup", {'precision_left': True, 'precision_hz_left': 1000.0, 'precision_overrun': 'catchup'}, ["ENABLE_LEFT"]),
+    ("fixed 500 both", {'precision_left': True, 'precision_hz_left': 500.0,
+                        'precision_right': True, 'precision_hz_right': 500.0}, ["ENABLE_LEFT", "ENABLE_RIGHT"]),
+]
+
+DISABLE = {"ENABLE_LEFT": "DISABLE_LEFT", "ENABLE_RIGHT": "DISABLE_RIGHT"}
+
+def bench_sleepers(args):
+    print(f"{'backend':<10} {'cpu ms/1k':>10} {'p50 us':>8} {'p99 us':>8} {'max us':>8}")
+    for name, cls in SLEEPERS.items():
+        try:
+            kwargs = {'drift_sec': 0.0}
+            if args.spin_tail_us is not None: kwargs['spin_cap_sec'] = args.spin_tail_us / 1e6
+            sleeper = cls(**kwargs)
+        except (OSError, AttributeError) as err:
+            print(f"{name:<10} unavailable: {err}")
+            continue
+
+        lateness = []
+        target = time.perf_counter() + args.interval
+        for _ in range(args.events):
+            sleeper.sleep_until(target)
+            lateness.append((time.perf_counter() - target) * 1e6)
+            target += args.interval
+        sleeper.close()
+        lateness.sort()
+
+        print(f"{name:<10} {sleeper.cpu_ms_per_1k():>10.2f} {percentile(lateness, 50):>8.1f} "
+              f"{percentile(lateness, 99):>8.1f} {lateness[-1]:>8.1f}")
+
+class GcWatch:
+    def __init__(self):
+        self.collections = 0
+        self.pause = 0.0
+        self.worst = 0.0
+        self.started = 0.0
+        gc.callbacks.append(self.hook)
+
+    def hook(self, phase, info):
+        if phase == "start":
+            self.started = time.perf_counter()
+        else:
+            took = time.perf_counter() - self.started
+            self.collections += 1
+            self.pause += took
+            self.worst = max(self.worst, took)
+
+    def close(self):
+        gc.callbacks.remove(self.hook)
+
+def bench_engine(args):
+    # engine_main starts a fresh interpreter, so the real engine heap is small; --heap-objects adds
+    # long-lived objects to see what GC pauses would cost if it grew.
+    ballast = [{'i': i, 'next': [i]} for i in range(args.heap_objects)]
+    ctrl = ControlChannel()
+    sink = RecordingSink(keep=False)
+    trace = EventTrace(args.trace) if args.trace else None
+    eng = GhostEngine(sink=sink, seed=args.seed, trace=trace)
+    eng.gc_guard = not args.no_gc_guard
+    watch = GcWatch()
+    worker = threading.Thread(target=eng.run, args=(ctrl,))
+    worker.start()
+
+    base = dict(BASE_CONFIG, sleeper=args.sleeper)
+    print(f"{'scenario':<17} {'ch':<2} {'target':>6} {'cps':>6} {'p50 us':>8} {'p99 us':>8} {'max us':>8} "
+          f"{'cpu us/ev':>10} {'blocks/ev':>10} {'gc runs':>8} {'gc max us':>10} {'overruns':>8}")
+    try:
+        for name, cfg, states in ENGINE_SCENARIOS:
+            ctrl.send_config(dict(base, **cfg))
+            events_before = ctrl.telemetry.head[0]
+            cpu_before = time.process_time()
+            since = time.perf_counter()
+            for msg in states: ctrl.send_state(msg)
+            time.sleep(0.05)
+            blocks_before = sys.getallocatedblocks()
+            runs_before = watch.collections
+            watch.worst = 0.0
+
+            time.sleep(args.duration)
+            # Sampled while channels are still running, so only the steady state is counted.
+            blocks = sys.getallocatedblocks() - blocks_before
+            runs = watch.collections - runs_before
+            worst_gc = watch.worst
+            for msg in states: ctrl.send_state(DISABLE[msg])
+            time.sleep(0.2)
+
+            events = ctrl.telemetry.head[0] - events_before
+            cpu_per_event = (time.process_time() - cpu_before) / max(1, events) * 1e6
+            blocks_per_event = blocks / max(1, events)
+            stats = ctrl.telemetry.stats(since=since)
+            for channel, label in ((0, "L"), (1, "R")):
+                s = stats.get(channel)
+                if not s: continue
+                side = 'left' if channel == 0 else 'right'
+                target = cfg.get(f'precision_hz_{side}') if cfg.get(f'precision_{side}') else cfg.get(f'cps_{side}', 0.0)
+                print(f"{name:<17} {label:<2} {target:>6.1f} {s['cps']:>6.2f} {s['p50']*1e6:>8.1f} "
+                      f"{s['p99']*1e6:>8.1f} {s['max']*1e6:>8.1f} {cpu_per_event:>10.1f} "
+                      f"{blocks_per_event:>10.2f} {runs:>8} {worst_gc*1e6:>10.1f} {s['overruns']:>8}")
+    finally:
+        ctrl.send_state("STOP")
+        worker.join()
+        ctrl.close()
+        watch.close()
+        del ballast
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"events written: {sink.written}  syn reports: {sink.syns}  write calls: {sink.writes}  "
+          f"peak RSS: {peak_rss / 1024:.1f} MiB")
+
+def make_garbage(stop, rate):
+    # Self-referencing lists only the cyclic collector can free, as a UI thread or plugin would leave behind.
+    # Each is held for about a second first, so some reach the oldest generation and force full collections.
+    held = collections.deque(maxlen=rate)
+    while not stop.is_set():
+        for _ in range(rate // 100):
+            junk = []
+            junk.append(junk)
+            held.append(junk)
+        time.sleep(0.01)
+
+def bench_gc(args):
+    # One scenario twice on the same seed and heap: collector left running, then the engine's GC guard.
+    ballast = [{'i': i, 'next': [i]} for i in range(args.heap_objects)]
+    name, cfg, states = next(sc for sc in ENGINE_SCENARIOS if sc[0] == args.scenario)
+    print(f"{name}: {len(ballast)} heap objects, {args.garbage} cyclic objects/s from another thread")
+    print(f"{'gc guard':<9} {'p50 us':>8} {'p99 us':>8} {'max us':>8} {'cpu us/ev':>10} {'gc runs':>8} "
+          f"{'gc total ms':>12} {'gc max us':>10}")
+    for guard in (False, True):
+        gc.collect()
+        ctrl = ControlChannel()
+        eng = GhostEngine(sink=RecordingSink(keep=False), seed=args.seed)
+        eng.gc_guard = guard
+        worker = threading.Thread(target=eng.run, args=(ctrl,))
+        worker.start()
+        stop = threading.Event()
+        churn = threading.Thread(target=make_garbage, args=(stop, args.garbage))
+        watch = GcWatch()
+        try:
+            ctrl.send_config(dict(BASE_CONFIG, sleeper=args.sleeper, **cfg))
+            churn.start()
+            time.sleep(0.2)
+            events_before = ctrl.telemetry.head[0]
+            cpu_before = time.process_time()
+            since = time.perf_counter()
+            for msg in states: ctrl.send_state(msg)
+            time.sleep(0.05)
+            runs_before, pause_before = watch.collections, watch.pause
+            watch.worst = 0.0
+            time.sleep(args.duration)
+            runs, pause, worst = watch.collections - runs_before, watch.pause - pause_before, watch.worst
+            for msg in states: ctrl.send_state(DISABLE[msg])
+            time.sleep(0.2)
+            events = ctrl.telemetry.head[0] - events_before
+            cpu_per_event = (time.process_time() - cpu_before) / max(1, events) * 1e6
+            stats = ctrl.telemetry.stats(since=since).values()
+        finally:
+            stop.set()
+            if churn.is_alive(): churn.join()
+            ctrl.send_state("STOP")
+            worker.join()
+            ctrl.close()
+            watch.close()
+        if not stats:
+            print(f"{'on' if guard else 'off':<9} no events")
+            continue
+        # Both channels' lateness is folded into the worse of the two.
+        p50 = max(st['p50'] for st in stats)
+        p99 = max(st['p99'] for st in stats)
+        late = max(st['max'] for st in stats)
+        print(f"{'on' if guard else 'off':<9} {p50*1e6:>8.1f} {p99*1e6:>8.1f} {late*1e6:>8.1f} {cpu_per_event:>10.1f} "
+              f"{runs:>8} {pause*1000:>12.1f} {worst*1e6:>10.1f}")
+    del ballast
+
+class PipeKeyboard:
+    # Stand-in evdev node: the listener reads raw input_events from a pipe, so no /dev/uinput is needed.
+    def __init__(self, keys):
+        self.fd, self.w = os.pipe()
+        os.set_blocking(self.fd, False)
+        self.path = f"pipe:{self.fd}"
+        self.name = "bench keyboard"
+        self.phys = ""
+        self.info = types.SimpleNamespace(bustype=0, vendor=0, product=0, version=0)
+        self.keys = keys
+
+    def capabilities(self):
+        return {e.EV_KEY: list(self.keys)}
+
+    def tap(self, code):
+        # Timestamped like a kernel with EVIOCSCLOCKID(CLOCK_MONOTONIC) would.
+        now = time.perf_counter()
+        sec, usec = int(now), int((now - int(now)) * 1e6)
+        os.write(self.w, INPUT_EVENT.pack(sec, usec, e.EV_KEY, code, 1) + INPUT_EVENT.pack(sec, usec, e.EV_SYN, 0, 0) +
+                 INPUT_EVENT.pack(sec, usec, e.EV_KEY, code, 0) + INPUT_EVENT.pack(sec, usec, e.EV_SYN, 0, 0))
+
+    def close(self):
+        os.close(self.fd)
+
+def trigger_engine_proc(ctrl, devices, seed):
+    GhostEngine(sink=RecordingSink(keep=False), seed=seed, trigger_devices=devices).run(ctrl)
+
+def first_press(telemetry, start, since, timeout=1.0):
+    # Only new ring slots are read, and the loop sleeps first so the engine gets the CPU.
+    deadline = time.perf_counter() + timeout
+    n = start
+    while time.perf_counter() < deadline:
+        time.sleep(0.0002)
+        head = telemetry.head[0]
+        while n < head:
+            i = (n & telemetry.mask) * telemetry.FIELDS
+            written, channel, kind = telemetry.slots[i + 1], telemetry.slots[i + 2], telemetry.slots[i + 3]
+            if channel == 0 and kind == EV_PRESS and written >= since: return written
+            n += 1
+    return None
+
+def bench_trigger(args):
+    trigger = e.KEY_F6
+    print(f"{'path':<8} {'n':>4} {'p50 us':>8} {'p99 us':>8} {'max us':>8}")
+    for path in ("ui", "engine"):
+        ctrl = ControlChannel()
+        kbd = PipeKeyboard([trigger])
+        in_engine = path == "engine"
+        proc = multiprocessing.Process(target=trigger_engine_proc, args=(ctrl, [kbd] if in_engine else [], args.seed))
+        proc.start()
+
+        listener = None
+        if not in_engine:
+            # Mirrors MoonlightApp.trigger_toggle: listener thread -> control pipe -> engine.
+            active = [False]
+            def toggle(channel):
+                active[0] = not active[0]
+                ctrl.send_state("ENABLE_LEFT" if active[0] else "DISABLE_LEFT")
+            listener = GlobalListener(toggle, None, None, None, None, initial_keys={'left': trigger},
+                                      handle_hide=False, devices=[kbd], probe=ctrl.latency)
+            listener.start()
+
+        ctrl.send_config(dict(BASE_CONFIG, cps_left=10.0, engine_triggers=in_engine, trigger_left=trigger,
+                              trigger_mode='toggle', sleeper=args.sleeper))
+        time.sleep(0.3)
+        latencies = []
+        for _ in range(args.repeat):
+            start = ctrl.telemetry.head[0]
+            since = time.perf_counter()
+            kbd.tap(trigger)
+            written = first_press(ctrl.telemetry, start, since)
+            if written is not None: latencies.append((written - since) * 1e6)
+            time.sleep(0.02)
+            kbd.tap(trigger)
+            time.sleep(0.05)
+
+        ctrl.send_state("STOP")
+        proc.join(2.0)
+        if proc.is_alive(): proc.terminate()
+        if listener is not None: listener.stop()
+        stages = latency_text(ctrl.latency.report())
+        ctrl.close()
+        latencies.sort()
+        if not latencies:
+            print(f"{path:<8} no clicks observed")
+            continue
+        print(f"{path:<8} {len(latencies):>4} {percentile(latencies, 50):>8.1f} {percentile(latencies, 99):>8.1f} {latencies[-1]:>8.1f}")
+        for line in stages.splitlines(): print(f"         {line}")
+
+def forked_engine_proc(ctrl):
+    GhostEngine(sink=RecordingSink(keep=False)).run(ctrl)
+
+def wait_ready(ctrl, start, timeout=10.0):
+    while time.perf_counter() - start < timeout:
+        for msg in ctrl.notifications():
+            if msg == "READY": return time.perf_counter() - start
+        time.sleep(0.0005)
+    return None
+
+def proc_memory(pid):
+    # (RSS, USS) in MiB; USS counts only pages private to the process, which is what a fork really costs.
+    rss = uss = 0
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] == "Rss:": rss += int(parts[1])
+            elif parts[0] in ("Private_Clean:", "Private_Dirty:"): uss += int(parts[1])
+    return rss / 1024.0, uss / 1024.0
+
+def bench_spawn(args):
+    # Old path: fork the UI process (multiprocessing default). New path: exec engine_main.py.
+    loaded = ["ghost_core", "input_listener"]
+    import managers
+    loaded.append("managers")
+    try:
+        import gi
+        gi.require_version('Gtk', '4.0')
+        gi.require_version('Adw', '1')
+        from gi.repository import Gtk, Adw
+        import ui_builder
+        loaded += ["Gtk", "Adw", "ui_builder"]
+    except (ImportError, ValueError) as err:
+        print(f"GTK not importable ({err}); the forked engine inherits less than it would under the app")
+    # Stands in for the rest of the GTK process's heap.
+    ballast = [{'i': i, 'next': [i]} for i in range(args.heap_objects)]
+    print(f"parent modules: {', '.join(loaded)}; {len(ballast)} ballast objects")
+    print(f"{'launch':<8} {'n':>3} {'ready p50 ms':>13} {'ready max ms':>13} {'RSS MiB':>9} {'USS MiB':>9}")
+
+    for launch in ("fork", "exec"):
+        readies, rss, uss = [], [], []
+        for _ in range(args.repeat):
+            ctrl = ControlChannel()
+            start = time.perf_counter()
+            if launch == "fork":
+                proc = multiprocessing.Process(target=forked_engine_proc, args=(ctrl,))
+                proc.start()
+            else:
+                proc = subprocess.Popen(engine_command(ctrl.handles(), dry_run=True),
+                                        pass_fds=(ctrl.reader, ctrl.notify_writer))
+                ctrl.release_engine_fds()
+            ready = wait_ready(ctrl, start)
+            if ready is not None:
+                readies.append(ready * 1000.0)
+                ctrl.send_config(dict(BASE_CONFIG, cps_left=15.0))
+                ctrl.send_state("ENABLE_LEFT")
+                time.sleep(args.settle)
+                r, u = proc_memory(proc.pid)
+                rss.append(r)
+                uss.append(u)
+            ctrl.send_state("STOP")
+            if launch == "fork":
+                proc.join(2.0)
+                if proc.is_alive(): proc.terminate()
+            else:
+                try: proc.wait(2.0)
+                except subprocess.TimeoutExpired: proc.terminate()
+            ctrl.close()
+        if not readies:
+            print(f"{launch:<8} engine never became ready")
+            continue
+        readies.sort()
+        print(f"{launch:<8} {len(readies):>3} {percentile(readies, 50):>13.1f} {readies[-1]:>13.1f} "
+              f"{sum(rss) / len(rss):>9.1f} {sum(uss) / len(uss):>9.1f}")
+
+def proc_cpu(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+def bench_daemon(args):
+    import tempfile
+    from daemon import DaemonClient
+    here = os.path.dirname(os.path.abspath(__file__))
+    tmp = tempfile.mkdtemp(prefix="moonlight-bench-")
+    path = os.path.join(tmp, "moonlight.sock")
+    proc = subprocess.Popen([sys.executable, os.path.join(here, "daemon.py"), "--socket", path, "serve",
+                             "--config-dir", os.path.join(tmp, "config"), "--dry-run"], stdout=subprocess.DEVNULL)
+    try:
+        deadline = time.perf_counter() + 10.0
+        client = None
+        while client is None and time.perf_counter() < deadline:
+            try:
+                client = DaemonClient(path)
+            except OSError:
+                time.sleep(0.01)
+        if client is None:
+            print("daemon did not come up")
+            return 1
+
+        print(f"{'request':<10} {'n':>5} {'p50 us':>8} {'p99 us':>8} {'max us':>8}")
+        requests = (("ping", {}), ("status", {}), ("toggle", {'channel': 'left'}),
+                    ("set", {'config': {'cps_left': 14.0}}))
+        for op, fields in requests:
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                client.call(op, **fields)
+                times.append((time.perf_counter() - start) * 1e6)
+            times.sort()
+            print(f"{op:<10} {len(times):>5} {percentile(times, 50):>8.1f} {percentile(times, 99):>8.1f} {times[-1]:>8.1f}")
+        if client.call("status")['left']: client.call("disable", channel='left')
+
+        children = open(f"/proc/{proc.pid}/task/{proc.pid}/children").read().split()
+        cpu = proc_cpu(proc.pid)
+        time.sleep(args.idle)
+        idle_cpu = (proc_cpu(proc.pid) - cpu) / args.idle * 100.0
+        print(f"{'process':<10} {'RSS MiB':>8} {'USS MiB':>8} {'idle CPU %':>11}")
+        rss, uss = proc_memory(proc.pid)
+        print(f"{'daemon':<10} {rss:>8.1f} {uss:>8.1f} {idle_cpu:>11.2f}")
+        for pid in children:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmdline = f.read()
+            label = "engine" if b"engine_main" in cmdline else "tracker" if b"resource_tracker" in cmdline else "child"
+            rss, uss = proc_memory(int(pid))
+            print(f"{label:<10} {rss:>8.1f} {uss:>8.1f}")
+        client.call("shutdown")
+        client.close()
+        proc.wait(5.0)
+    finally:
+        if proc.poll() is None: proc.terminate()
+
+def bench_uinput(args):
+    full_keys = set(e.keys.keys()) | {e.BTN_LEFT, e.BTN_RIGHT, e.BTN_MIDDLE, e.BTN_SIDE, e.BTN_EXTRA}
+    rows = []
+    try:
+        for label, keys in (("full keymap", full_keys), ("minimal", set(BASE_KEYS))):
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                ui = create_uinput(keys)
+                times.append((time.perf_counter() - start) * 1000.0)
+                ui.close()
+            times.sort()
+            rows.append((label, len(keys), times))
+
+        sink = BatchedUInputSink()
+        rebuilds = []
+        for code in (e.KEY_F, e.KEY_G, e.KEY_H, e.KEY_J, e.KEY_K)[:args.repeat]:
+            sink.ensure_key(code)
+            rebuilds.append(sink.last_rebuild_ms)
+        sink.close()
+        rebuilds.sort()
+        rows.append(("rebuild +1 key", len(sink.keys), rebuilds))
+    except (UInputError, OSError) as err:
+        print(f"uinput unavailable: {err}")
+        return 1
+
+    print(f"{'device':<16} {'keys':>5} {'p50 ms':>8} {'max ms':>8}")
+    for label, nkeys, times in rows:
+        print(f"{label:<16} {nkeys:>5} {percentile(times, 50):>8.2f} {times[-1]:>8.2f}")
+
+def bench_startup(args):
+    # Launches the real app and reads the time-to-first-window line it prints (needs a display).
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    env = dict(os.environ, MOONLIGHT_STARTUP_EXIT="1")
+    times = []
+    for _ in range(args.repeat):
+        try:
+            out = subprocess.run([sys.executable, main_py], env=env, capture_output=True, text=True, timeout=30).stdout
+        except subprocess.TimeoutExpired:
+            print("startup timed out")
+            return 1
+        for line in out.splitlines():
+            if line.startswith("Startup: first window in "):
+                times.append(float(line.split()[-2]))
+    if not times:
+        print("no first window observed (is a display available?)")
+        return 1
+    times.sort()
+    print(f"{'runs':>5} {'p50 ms':>8} {'min ms':>8} {'max ms':>8}")
+    print(f"{len(times):>5} {percentile(times, 50):>8.1f} {times[0]:>8.1f} {times[-1]:>8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Moonlight engine benchmarks")
+    sub = parser.add_subparsers(dest="suite", required=True)
+
+    p_sleep = sub.add_parser("sleepers", help="CPU cost and precision of each sleeper backend")
+    p_sleep.add_argument("--events", type=int, default=1000)
+    p_sleep.add_argument("--interval", type=float, default=0.005)
+    p_sleep.add_argument("--spin-tail-us", type=float, default=None)
+    p_sleep.set_defaults(func=bench_sleepers)
+
+    p_eng = sub.add_parser("engine", help="Drive GhostEngine.run headless through scripted scenarios")
+    p_eng.add_argument("--duration", type=float, default=3.0)
+    p_eng.add_argument("--seed", type=int, default=1234)
+    p_eng.add_argument("--sleeper", choices=list(SLEEPERS), default="spin")
+    p_eng.add_argument("--trace", default=None, help="also write a binary event trace to this path")
+    p_eng.add_argument("--no-gc-guard", action="store_true", help="leave the cyclic GC running while channels click")
+    p_eng.add_argument("--heap-objects", type=int, default=0, help="extra long-lived objects to keep on the heap")
+    p_eng.set_defaults(func=bench_engine)
+
+    p_gc = sub.add_parser("gc", help="Lateness with the cyclic GC running vs the engine's GC guard")
+    p_gc.add_argument("--scenario", choices=[sc[0] for sc in ENGINE_SCENARIOS], default="fixed 1k skip")
+    p_gc.add_argument("--duration", type=float, default=5.0)
+    p_gc.add_argument("--seed", type=int, default=1234)
+    p_gc.add_argument("--sleeper", choices=list(SLEEPERS), default="spin")
+    p_gc.add_argument("--heap-objects", type=int, default=200000, help="long-lived objects each full collection walks")
+    p_gc.add_argument("--garbage", type=int, default=20000, help="cyclic objects per second made by another thread")
+    p_gc.set_defaults(func=bench_gc)
+
+    p_trig = sub.add_parser("trigger", help="Trigger press to first click, via the UI process or inside the engine")
+    p_trig.add_argument("--repeat", type=int, default=100)
+    p_trig.add_argument("--seed", type=int, default=1234)
+    p_trig.add_argument("--sleeper", choices=list(SLEEPERS), default="spin")
+    p_trig.set_defaults(func=bench_trigger)
+
+    p_spawn = sub.add_parser("spawn", help="Engine launch: fork of the UI process vs the lean engine_main.py")
+    p_spawn.add_argument("--repeat", type=int, default=5)
+    p_spawn.add_argument("--heap-objects", type=int, default=200000, help="long-lived objects on the parent's heap")
+    p_spawn.add_argument("--settle", type=float, default=0.5, help="seconds of clicking before memory is sampled")
+    p_spawn.set_defaults(func=bench_spawn)
+
+    p_daemon = sub.add_parser("daemon", help="Headless daemon: control round trip, memory and idle CPU")
+    p_daemon.add_argument("--repeat", type=int, default=500)
+    p_daemon.add_argument("--idle", type=float, default=2.0, help="seconds to sample idle CPU over")
+    p_daemon.set_defaults(func=bench_daemon)
+
+    p_ui = sub.add_parser("uinput", help="Virtual device creation and rebuild cost (needs /dev/uinput access)")
+    p_ui.add_argument("--repeat", type=int, default=5)
+    p_ui.set_defaults(func=bench_uinput)
+
+    p_start = sub.add_parser("startup", help="Time from launch to the first painted window (needs a display)")
+    p_start.add_argument("--repeat", type=int, default=5)
+    p_start.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+import os
+import sys
+import json
+import math
+import socket
+import signal
+import argparse
+import selectors
+import subprocess
+
+from ghost_core import (ControlChannel, rt_status_text, CONFIG_FIELDS, MODES, TRIGGER_MODES, SLEEPER_NAMES,
+                        OVERRUN_POLICIES, KEY_MAX)
+from input_listener import GlobalListener
+from managers import PresetManager, ConfigWriter, CONFIG_DIR, DEFAULT_CONFIG, load_config
+from engine_main import mask_process, engine_command
+
+# Headless Moonlight: the engine and the trigger listener without GTK, driven over a Unix socket.
+# One JSON object per line each way. Requests carry "op"; replies carry "ok" and, on failure, "error".
+#   {"op": "enable", "channel": "left"}        enable / disable / toggle
+#   {"op": "set", "config": {"cps_left": 14}}  config update, persisted like the GUI does
+#   {"op": "preset", "name": "Default"}        load a saved preset (its theme part is ignored)
+#   {"op": "presets"}  {"op": "status"}  {"op": "ping"}  {"op": "shutdown"}
+
+CHANNELS = ('left', 'right')
+
+CHOICES = {'mode': MODES, 'trigger_mode': TRIGGER_MODES, 'sleeper': SLEEPER_NAMES, 'precision_overrun': OVERRUN_POLICIES}
+# Inclusive bounds; the type of the bounds is the type the value is stored as.
+LIMITS = {
+    'cps_left': (1.0, 100.0),
+    'cps_right': (1.0, 100.0),
+    'jitter': (0.0, 10.0),
+    'assist_wtap_chance': (0.0, 100.0),
+    'assist_blockhit_chance': (0.0, 100.0),
+    'precision_hz_left': (1.0, 1000.0),
+    'precision_hz_right': (1.0, 1000.0),
+    'spin_tail_us': (-1.0, 100000.0),
+    'rand': (1, 2),
+    'rt_cpu': (-1, 4095),
+    'rt_priority': (1, 99),
+    'target_btn': (-1, KEY_MAX),
+    'trigger_left': (0, KEY_MAX),
+    'trigger_right': (0, KEY_MAX),
+    'hide_key': (0, KEY_MAX),
+}
+
+def default_socket_path():
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    return os.path.join(runtime or CONFIG_DIR, "moonlight.sock")
+
+class MoonlightDaemon:
+    def __init__(self, socket_path, config_dir=CONFIG_DIR, dry_run=False):
+        self.socket_path = socket_path
+        self.server = self.bind(socket_path)
+        self.config_dir = config_dir
+        self.config = load_config(config_dir)
+        self.config_writer = ConfigWriter(os.path.join(config_dir, "config.json"))
+        self.preset_mgr = PresetManager(config_dir, DEFAULT_CONFIG)
+        self.active = {'left': False, 'right': False}
+        self.running = True
+
+        self.ctrl = ControlChannel()
+        self.proc = subprocess.Popen(engine_command(self.ctrl.handles(), dry_run=dry_run),
+                                     pass_fds=(self.ctrl.reader, self.ctrl.notify_writer))
+        self.ctrl.release_engine_fds()
+
+        self.listener = GlobalListener(
+            toggle_cb=self.trigger_toggle,
+            start_cb=lambda ch: self.set_active(ch, True),
+            stop_cb=lambda ch: self.set_active(ch, False),
+            rebind_cb=None,
+            toggle_gui_cb=None,
+            initial_keys={
+                'left': self.config.get('trigger_left', 64),
+                'right': self.config.get('trigger_right', 65),
+                'hide': self.config.get('hide_key', 54)
+            },
+            initial_mode=self.config.get('trigger_mode', 'toggle'),
+            initial_app_mode=self.config.get('mode', 'mouse'),
+            handle_triggers=not self.config.get('engine_triggers', False),
+            handle_hide=False,
+            probe=self.ctrl.latency
+        )
+
+        self.clients = {}
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.server, selectors.EVENT_READ, self.accept)
+        self.selector.register(self.ctrl.notify_reader, selectors.EVENT_READ, self.on_engine_notify)
+
+        self.ctrl.send_config(self.config)
+
+    def bind(self, path):
+        if os.path.exists(path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+                raise RuntimeError(f"another daemon is listening on {path}")
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.unlink(path)
+            finally:
+                probe.close()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # The socket can start and stop input injection, so only this user may connect.
+        old = os.umask(0o177)
+        try:
+            sock.bind(path)
+        finally:
+            os.umask(old)
+        sock.listen(8)
+        sock.setblocking(False)
+        return sock
+
+    def set_active(self, channel, active):
+        self.active[channel] = active
+        try:
+            self.ctrl.send_state(("ENABLE_" if active else "DISABLE_") + channel.upper())
+        except OSError:
+            # The engine is gone (its STOP is what ends run()); nothing is left to tell.
+            pass
+
+    def trigger_toggle(self, channel):
+        self.set_active(channel, not self.active[channel])
+
+    def check_config(self, cfg):
+        # Everything is validated before anything is applied, so a bad value never reaches
+        # the listener, config.json or the engine. Numbers are normalized in place.
+        for key, val in cfg.items():
+            if key in CHOICES:
+                if val not in CHOICES[key]: return f"{key} must be one of {', '.join(CHOICES[key])}"
+            elif key in LIMITS:
+                if key == 'spin_tail_us' and val is None: continue
+                lo, hi = LIMITS[key]
+                try:
+                    num = type(lo)(val)
+                except (TypeError, ValueError, OverflowError):
+                    return f"bad value for {key}: {val!r}"
+                if isinstance(val, bool) or not math.isfinite(num) or not lo <= num <= hi:
+                    return f"{key} must be a number from {lo} to {hi}"
+                cfg[key] = num
+            elif CONFIG_FIELDS.get(key) is bool:
+                if not isinstance(val, bool): return f"{key} must be true or false"
+            else:
+                return f"unknown config key {key!r}"
+        return None
+
+    def apply_config(self, cfg):
+        cfg = dict(cfg)
+        error = self.check_config(cfg)
+        if error: return error
+        # Same listener sync the window does in update_ui_from_config.
+        listener = self.listener
+        if 'trigger_left' in cfg: listener.set_binding('trigger_left', cfg['trigger_left'])
+        if 'trigger_right' in cfg: listener.set_binding('trigger_right', cfg['trigger_right'])
+        if 'hide_key' in cfg: listener.set_binding('hide', cfg['hide_key'])
+        if 'mode' in cfg: listener.set_app_mode(cfg['mode'])
+        if 'trigger_mode' in cfg: listener.set_trigger_mode(cfg['trigger_mode'])
+        if 'engine_triggers' in cfg: listener.set_trigger_handling(not cfg['engine_triggers'])
+        self.config.update(cfg)
+        self.config_writer.save(self.config)
+        self.ctrl.send_config(cfg)
+        return None
+
+    def handle(self, req):
+        op = req.get('op')
+        if op == 'ping':
+            return {'ok': True}
+        if op in ('enable', 'disable', 'toggle'):
+            channel = req.get('channel', 'left')
+            if channel not in CHANNELS: return {'ok': False, 'error': f"unknown channel {channel!r}"}
+            self.set_active(channel, not self.active[channel] if op == 'toggle' else op == 'enable')
+            return {'ok': True, channel: self.active[channel]}
+        if op == 'set':
+            cfg = req.get('config')
+            if not isinstance(cfg, dict): return {'ok': False, 'error': "set needs a config object"}
+            error = self.apply_config(cfg)
+            return {'ok': False, 'error': error} if error else {'ok': True}
+        if op == 'preset':
+            cfg = self.preset_mgr.load_preset(req.get('name', ''))
+            if not cfg: return {'ok': False, 'error': f"no preset named {req.get('name')!r}"}
+            error = self.apply_config({k: v for k, v in cfg.items() if k != '_theme_config'})
+            return {'ok': False, 'error': error} if error else {'ok': True}
+        if op == 'presets':
+            return {'ok': True, 'presets': self.preset_mgr.get_presets()}
+        if op == 'status':
+            stats = self.ctrl.telemetry.stats() if any(self.active.values()) else {}
+            return {
+                'ok': True,
+                'left': self.active['left'],
+                'right': self.active['right'],
+                'engine': rt_status_text(self.ctrl.telemetry.status),
+                'telemetry': {CHANNELS[ch]: s for ch, s in stats.items()},
+                'config': self.config,
+            }
+        if op == 'shutdown':
+            self.running = False
+            return {'ok': True}
+        return {'ok': False, 'error': f"unknown op {op!r}"}
+
+    def accept(self, sock):
+        try:
+            conn, _ = sock.accept()
+        except BlockingIOError:
+            return
+        conn.setblocking(False)
+        self.clients[conn] = bytearray()
+        self.selector.register(conn, selectors.EVENT_READ, self.on_client)
+
+    def drop(self, conn):
+        self.selector.unregister(conn)
+        del self.clients[conn]
+        conn.close()
+
+    def on_client(self, conn):
+        try:
+            data = conn.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self.drop(conn)
+            return
+        buf = self.clients[conn]
+        buf += data
+        out = bytearray()
+        while (end := buf.find(b"\n")) >= 0:
+            line = bytes(buf[:end])
+            del buf[:end + 1]
+            try:
+                req = json.loads(line)
+                reply = self.handle(req) if isinstance(req, dict) else {'ok': False, 'error': "request must be an object"}
+            except (TypeError, ValueError) as e:
+                reply = {'ok': False, 'error': f"bad request: {e}"}
+            out += json.dumps(reply, separators=(',', ':')).encode() + b"\n"
+        if out:
+            try:
+                conn.sendall(out)
+            except OSError:
+                # Replies are small; a client that doesn't read them is dropped rather than buffered.
+                self.drop(conn)
+
+    def on_engine_notify(self, fd):
+        for msg in self.ctrl.notifications():
+            if msg == "STOP":
+                print("Click engine exited")
+                self.running = False
+            elif msg.endswith("_LEFT"): self.active['left'] = msg.startswith("ENABLE")
+            elif msg.endswith("_RIGHT"): self.active['right'] = msg.startswith("ENABLE")
+
+    def run(self):
+        self.listener.open()
+        self.selector.register(self.listener.fileno(), selectors.EVENT_READ, lambda fd: self.listener.poll(0))
+        try:
+            while self.running:
+                # Without inotify the listener has to rescan for devices itself.
+                timeout = 0.5 if self.listener.watch is None else None
+                ready = self.selector.select(timeout)
+                for key, _ in ready:
+                    key.data(key.fileobj)
+                if not ready and timeout: self.listener.poll(0)
+        finally:
+            self.close()
+
+    def close(self):
+        # The listener goes first: releasing a held trigger still talks to the engine.
+        self.listener.close()
+        try: self.ctrl.send_state("STOP")
+        except OSError: pass
+        try: self.proc.wait(0.5)
+        except subprocess.TimeoutExpired: self.proc.terminate()
+        for conn in list(self.clients): self.drop(conn)
+        self.selector.close()
+        self.server.close()
+        try: os.unlink(self.socket_path)
+        except OSError: pass
+        self.ctrl.close()
+        self.config_writer.close()
+
+class DaemonClient:
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.rfile = self.sock.makefile('rb')
+
+    def call(self, op, **fields):
+        fields['op'] = op
+        self.sock.sendall(json.dumps(fields, separators=(',', ':')).encode() + b"\n")
+        line = self.rfile.readline()
+        if not line: raise ConnectionError("daemon closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+def parse_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless Moonlight daemon")
+    parser.add_argument("--socket", default=default_socket_path())
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_serve = sub.add_parser("serve", help="run the engine and trigger listener without a window")
+    p_serve.add_argument("--config-dir", default=CONFIG_DIR)
+    p_serve.add_argument("--dry-run", action="store_true", help="engine writes to an in-memory sink instead of /dev/uinput")
+
+    p_call = sub.add_parser("call", help="send one request to a running daemon")
+    p_call.add_argument("op", help="enable, disable, toggle, set, preset, presets, status, ping or shutdown")
+    p_call.add_argument("args", nargs="*", help="a channel, a preset name, or key=value config pairs")
+
+    args = parser.parse_args()
+
+    if args.cmd == "serve":
+        mask_process()
+        # SIGTERM/SIGINT unwind through run()'s finally so the engine and socket are cleaned up.
+        signal.signal(signal.SIGTERM, lambda *a: sys.exit(0))
+        try:
+            daemon = MoonlightDaemon(args.socket, args.config_dir, args.dry_run)
+        except RuntimeError as e:
+            print(e)
+            return 1
+        print(f"Listening on {args.socket}")
+        try:
+            daemon.run()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    fields = {}
+    if args.op in ('enable', 'disable', 'toggle') and args.args:
+        fields['channel'] = args.args[0]
+    elif args.op == 'preset' and args.args:
+        fields['name'] = " ".join(args.args)
+    elif args.op == 'set':
+        fields['config'] = {k: parse_value(v) for k, _, v in (a.partition("=") for a in args.args)}
+    try:
+        client = DaemonClient(args.socket)
+    except OSError as e:
+        print(f"Cannot reach daemon at {args.socket}: {e}")
+        return 1
+    reply = client.call(args.op, **fields)
+    client.close()
+    print(json.dumps(reply, indent=2))
+    return 0 if reply.get('ok') else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
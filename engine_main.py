@@ -0,0 +1,62 @@
+import os
+import sys
+import ctypes
+import signal
+import argparse
+
+# Lean entrypoint for the click engine. It runs as its own interpreter so it never carries the
+# GTK process's modules or heap; the UI hands over its pipe ends with pass_fds and the shared
+# memory blocks by name (ControlChannel.handles).
+
+def mask_process():
+    try:
+        libc = ctypes.cdll.LoadLibrary('libc.so.6')
+        name = b"kworker/u12:0"
+        libc.prctl(15, name, 0, 0, 0)
+    except Exception:
+        pass
+
+def engine_command(handles, dry_run=False):
+    cmd = [
+        sys.executable, os.path.abspath(__file__),
+        "--reader", str(handles['reader']),
+        "--notify", str(handles['notify_writer']),
+        "--config", handles['config'],
+        "--telemetry", handles['telemetry'],
+        "--latency", handles['latency'],
+    ]
+    if dry_run: cmd.append("--dry-run")
+    return cmd
+
+def main():
+    parser = argparse.ArgumentParser(description="Moonlight click engine")
+    parser.add_argument("--reader", type=int, required=True)
+    parser.add_argument("--notify", type=int, required=True)
+    parser.add_argument("--config", required=True)
+    parser.add_argument("--telemetry", required=True)
+    parser.add_argument("--latency", required=True)
+    parser.add_argument("--dry-run", action="store_true", help="write to an in-memory sink instead of /dev/uinput")
+    args = parser.parse_args()
+
+    mask_process()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from ghost_core import GhostEngine, ControlChannel, RecordingSink
+    ctrl = ControlChannel.attach(args.reader, args.notify, args.config, args.telemetry, args.latency)
+
+    trace = None
+    trace_path = os.environ.get("MOONLIGHT_TRACE")
+    if trace_path:
+        from event_trace import EventTrace
+        try:
+            trace = EventTrace(trace_path)
+        except OSError as e:
+            print(f"Failed to open event trace: {e}")
+    eng = GhostEngine(sink=RecordingSink(keep=False) if args.dry_run else None, trace=trace)
+    try:
+        eng.run(ctrl)
+    finally:
+        ctrl.close()
+
+if __name__ == "__main__":
+    main()
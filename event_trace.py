@@ -0,0 +1,176 @@
+import os
+import sys
+import mmap
+import struct
+from time import perf_counter
+
+MAGIC = b"MLTRACE1"
+# magic, capacity, count
+HEADER = struct.Struct("<8sQQ")
+HEADER_SIZE = 64
+
+# Columns are stored one after another so each one is a flat typed array.
+COLUMNS = (
+    ("ts", "d", 8),
+    ("type", "H", 2),
+    ("code", "H", 2),
+    ("value", "i", 4),
+    ("channel", "B", 1),
+)
+
+CHANNEL_ENGINE = 255
+
+def column_offsets(capacity):
+    offsets = {}
+    pos = HEADER_SIZE
+    for name, fmt, size in COLUMNS:
+        offsets[name] = pos
+        pos += capacity * size
+    return offsets, pos
+
+class EventTrace:
+    def __init__(self, path, capacity=1 << 22, writable=True):
+        self.path = path
+        self.writable = writable
+
+        if writable:
+            if capacity & (capacity - 1): raise ValueError("capacity must be a power of two")
+            _, total = column_offsets(capacity)
+            fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                os.ftruncate(fd, total)
+                self.mm = mmap.mmap(fd, total)
+            finally:
+                os.close(fd)
+            HEADER.pack_into(self.mm, 0, MAGIC, capacity, 0)
+        else:
+            with open(path, "rb") as f:
+                self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, capacity, _ = HEADER.unpack_from(self.mm, 0)
+            if magic != MAGIC: raise ValueError(f"{path} is not a Moonlight trace")
+
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self.offsets, _ = column_offsets(capacity)
+
+        self.buf = buf = memoryview(self.mm)
+        self.count_view = buf[16:24].cast("Q")
+        self.n = self.count_view[0]
+        self.cols = {}
+        for name, fmt, size in COLUMNS:
+            start = self.offsets[name]
+            self.cols[name] = buf[start:start + capacity * size].cast(fmt)
+        self.ts = self.cols["ts"]
+        self.types = self.cols["type"]
+        self.codes = self.cols["code"]
+        self.values = self.cols["value"]
+        self.channels = self.cols["channel"]
+
+    @classmethod
+    def open(cls, path):
+        return cls(path, writable=False)
+
+    def append(self, ts, etype, code, value, channel):
+        n = self.n
+        i = n & self.mask
+        self.ts[i] = ts
+        self.types[i] = etype
+        self.codes[i] = code
+        self.values[i] = value
+        self.channels[i] = channel
+        n += 1
+        self.n = n
+        self.count_view[0] = n
+
+    @property
+    def count(self):
+        return self.count_view[0]
+
+    @property
+    def start(self):
+        # Ring slot holding the oldest record still in the log.
+        n = self.count
+        return 0 if n <= self.capacity else n & self.mask
+
+    def columns(self):
+        # Raw ring-ordered views; only the first min(count, capacity) slots are valid.
+        return self.cols
+
+    def numpy(self):
+        try:
+            import numpy as np
+        except ImportError:
+            raise RuntimeError("NumPy is not available")
+        n = self.count
+        out = {}
+        for name, fmt, size in COLUMNS:
+            col = np.frombuffer(self.mm, dtype=np.dtype(fmt), count=self.capacity, offset=self.offsets[name])
+            if n <= self.capacity:
+                out[name] = col[:n]
+            else:
+                # Wrapped log: returned in chronological order, which needs a copy.
+                s = self.start
+                out[name] = np.concatenate((col[s:], col[:s]))
+        return out
+
+    def flush(self):
+        if self.writable: self.mm.flush()
+
+    def close(self):
+        for col in self.cols.values(): col.release()
+        self.cols = {}
+        self.ts = self.types = self.codes = self.values = self.channels = None
+        self.count_view.release()
+        self.buf.release()
+        self.mm.close()
+
+class TracingSink:
+    def __init__(self, sink, trace):
+        self.sink = sink
+        self.trace = trace
+        self.channel = CHANNEL_ENGINE
+
+    def write(self, etype, code, value):
+        self.sink.write(etype, code, value)
+        self.trace.append(perf_counter(), etype, code, value, self.channel)
+
+    def syn(self):
+        self.sink.syn()
+        self.trace.append(perf_counter(), 0, 0, 0, self.channel)
+
+    def flush(self):
+        self.sink.flush()
+
+    def ensure_key(self, code):
+        return self.sink.ensure_key(code)
+
+    def close(self):
+        self.sink.close()
+        self.trace.flush()
+        self.trace.close()
+
+def summarize(path):
+    trace = EventTrace.open(path)
+    n = min(trace.count, trace.capacity)
+    if not n:
+        print(f"{path}: empty")
+        trace.close()
+        return
+    cols = trace.columns()
+    ts = cols["ts"]
+    counts = {}
+    first = last = ts[trace.start]
+    for i in range(n):
+        key = (cols["channel"][i], cols["type"][i], cols["code"][i])
+        counts[key] = counts.get(key, 0) + 1
+        t = ts[i]
+        if t < first: first = t
+        if t > last: last = t
+    print(f"{path}: {trace.count} records ({n} kept), span {last - first:.3f} s")
+    for (ch, etype, code), c in sorted(counts.items()):
+        print(f"  channel {ch:>3}  type {etype:>2}  code {code:>4}  x{c}")
+    trace.close()
+
+if __name__ == "__main__":
+    for p in sys.argv[1:]:
+        summarize(p)
@@ -1,18 +1,172 @@
+import os
 import time
+import errno
 import random
 import sys
 import math
+import ctypes
+import ctypes.util
+from array import array
+import gc
+import heapq
+import selectors
+import struct
+import resource
+import json
+import mmap
 from evdev import UInput, ecodes as e
+from event_trace import TracingSink, CHANNEL_ENGINE
+from input_listener import GlobalListener
+
+np = None
+
+def load_numpy():
+    # Deferred so processes that only talk to the engine never import NumPy.
+    global np
+    if np is None:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            pass
+    return np
+
+# Releases sort ahead of a press scheduled for the same instant.
+EV_RELEASE = 0
+EV_BLOCKHIT_UP = 1
+EV_WTAP_UP = 2
+EV_PRESS = 3
+EV_KINDS = 4
+
+STATE_CODES = {
+    "CONFIG": 0, "STOP": 1, "PAUSE": 2, "RESUME": 3,
+    "ENABLE_LEFT": 4, "DISABLE_LEFT": 5,
+    "ENABLE_RIGHT": 6, "DISABLE_RIGHT": 7,
+    "READY": 8,
+}
+STATE_NAMES = {code: name for name, code in STATE_CODES.items()}
+
+# The control wait returns this long before a deadline; the sleeper backend finishes the approach.
+WAKE_LEAD = 0.001
+
+HOLD_MU = -3.2
+HOLD_SIGMA = 0.25
+HOLD_MIN = 0.022
+HOLD_MAX = 0.15
+
+# Fixed-rate precision mode: rate ceiling and press length as a share of the period.
+PRECISION_MAX_HZ = 1000.0
+PRECISION_DUTY = 0.5
+OVERRUN_POLICIES = ("skip", "catchup")
+TRIGGER_MODES = ("toggle", "hold")
+
+# Pools are topped up from the run loop only when the next deadline is at least this far away.
+REFILL_SLACK = 0.005
+
+CLOCK_MONOTONIC = 1
+TIMER_ABSTIME = 1
+TFD_CLOEXEC = 0o2000000
+TFD_TIMER_ABSTIME = 1
+
+class SamplePool:
+    __slots__ = ("size", "low", "rng", "np_rng", "uni", "ui", "nrm", "ni", "hld", "hi")
+
+    def __init__(self, size=4096, low_water=0.75, seed=None):
+        self.size = size
+        self.low = int(size * low_water)
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(seed) if load_numpy() is not None else None
+        self.fill_uniform()
+        self.fill_normal()
+        self.fill_hold()
+
+    def fill_uniform(self):
+        if self.np_rng is not None:
+            self.uni = array('d', self.np_rng.random(self.size).tobytes())
+        else:
+            r = self.rng.random
+            self.uni = array('d', [r() for _ in range(self.size)])
+        self.ui = 0
+
+    def fill_normal(self):
+        if self.np_rng is not None:
+            self.nrm = array('d', self.np_rng.standard_normal(self.size).tobytes())
+        else:
+            g = self.rng.gauss
+            self.nrm = array('d', [g(0.0, 1.0) for _ in range(self.size)])
+        self.ni = 0
+
+    def fill_hold(self):
+        if self.np_rng is not None:
+            vals = np.clip(self.np_rng.lognormal(HOLD_MU, HOLD_SIGMA, self.size), HOLD_MIN, HOLD_MAX)
+            self.hld = array('d', vals.tobytes())
+        else:
+            lv = self.rng.lognormvariate
+            self.hld = array('d', [max(HOLD_MIN, min(HOLD_MAX, lv(HOLD_MU, HOLD_SIGMA))) for _ in range(self.size)])
+        self.hi = 0
+
+    def needs_refill(self):
+        return self.ui > self.low or self.ni > self.low or self.hi > self.low
+
+    def refill(self):
+        if self.ui > self.low: self.fill_uniform()
+        if self.ni > self.low: self.fill_normal()
+        if self.hi > self.low: self.fill_hold()
+
+    def uniform(self):
+        i = self.ui
+        if i >= self.size:
+            self.fill_uniform()
+            i = 0
+        self.ui = i + 1
+        return self.uni[i]
+
+    def normal(self):
+        i = self.ni
+        if i >= self.size:
+            self.fill_normal()
+            i = 0
+        self.ni = i + 1
+        return self.nrm[i]
+
+    def hold(self):
+        i = self.hi
+        if i >= self.size:
+            self.fill_hold()
+            i = 0
+        self.hi = i + 1
+        return self.hld[i]
+
+class timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+class itimerspec(ctypes.Structure):
+    _fields_ = [("it_interval", timespec), ("it_value", timespec)]
+
+def load_libc():
+    try:
+        return ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    except OSError:
+        return None
 
 class HighResSleeper:
-    def __init__(self, spin_cap_sec=0.00025, drift_sec=0.00002):
+    name = "spin"
+
+    def __init__(self, spin_cap_sec=0.00025, drift_sec=0.00002, seed=None):
         self.spin_cap = float(spin_cap_sec)
         self.drift = float(drift_sec)
+        self.events = 0
+        self.cpu_time = 0.0
+        self.samples = SamplePool(size=1024, seed=seed)
 
-    def sleep_until(self, target_time):
-        clock_drift = random.uniform(-self.drift, self.drift)
-        target = target_time + clock_drift
+    def sleep_until(self, target_time, exact=False):
+        cpu_start = time.thread_time()
+        if not exact: target_time += self.drift * (2.0 * self.samples.uniform() - 1.0)
+        self.wait(target_time)
+        self.cpu_time += time.thread_time() - cpu_start
+        self.events += 1
 
+    def wait(self, target):
         while True:
             now = time.perf_counter()
             rem = target - now
@@ -21,8 +175,496 @@ class HighResSleeper:
             if rem > self.spin_cap:
                 time.sleep(rem - self.spin_cap)
 
+    def spin(self, target):
+        while time.perf_counter() < target:
+            pass
+
+    def cpu_ms_per_1k(self):
+        if not self.events: return 0.0
+        return self.cpu_time / self.events * 1000.0 * 1000.0
+
+    def close(self):
+        pass
+
+class NanoSleeper(HighResSleeper):
+    name = "nanosleep"
+
+    def __init__(self, spin_cap_sec=0.00005, drift_sec=0.00002, seed=None):
+        super().__init__(spin_cap_sec, drift_sec, seed)
+        self.libc = load_libc()
+        self.nanosleep = self.libc.clock_nanosleep
+        self.req = timespec()
+        # perf_counter is CLOCK_MONOTONIC on Linux; the offset only guards other builds.
+        self.offset = time.clock_gettime(time.CLOCK_MONOTONIC) - time.perf_counter()
+
+    def wait(self, target):
+        wake = target - self.spin_cap + self.offset
+        if wake > time.clock_gettime(time.CLOCK_MONOTONIC):
+            sec = int(wake)
+            self.req.tv_sec = sec
+            self.req.tv_nsec = int((wake - sec) * 1e9)
+            while self.nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME, ctypes.byref(self.req), None) == errno.EINTR:
+                pass
+        self.spin(target)
+
+class TimerFdSleeper(HighResSleeper):
+    name = "timerfd"
+
+    def __init__(self, spin_cap_sec=0.00005, drift_sec=0.00002, seed=None):
+        super().__init__(spin_cap_sec, drift_sec, seed)
+        self.libc = load_libc()
+        self.fd = self.libc.timerfd_create(CLOCK_MONOTONIC, TFD_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "timerfd_create failed")
+        self.spec = itimerspec()
+        self.offset = time.clock_gettime(time.CLOCK_MONOTONIC) - time.perf_counter()
+
+    def wait(self, target):
+        wake = target - self.spin_cap + self.offset
+        if wake > time.clock_gettime(time.CLOCK_MONOTONIC):
+            sec = int(wake)
+            self.spec.it_value.tv_sec = sec
+            self.spec.it_value.tv_nsec = int((wake - sec) * 1e9)
+            self.libc.timerfd_settime(self.fd, TFD_TIMER_ABSTIME, ctypes.byref(self.spec), None)
+            try:
+                os.read(self.fd, 8)
+            except InterruptedError:
+                pass
+        self.spin(target)
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+SLEEPERS = {
+    "spin": HighResSleeper,
+    "nanosleep": NanoSleeper,
+    "timerfd": TimerFdSleeper,
+}
+
+def make_sleeper(name="spin", spin_tail_us=None, seed=None):
+    cls = SLEEPERS.get(name, HighResSleeper)
+    try:
+        if spin_tail_us is None: return cls(seed=seed)
+        return cls(spin_cap_sec=float(spin_tail_us) / 1e6, seed=seed)
+    except (OSError, AttributeError) as err:
+        print(f"Sleeper '{name}' unavailable ({err}), falling back to spin")
+        return HighResSleeper(seed=seed)
+
+MODES = ("mouse", "keyboard")
+KEY_MAX = e.KEY_MAX
+SLEEPER_NAMES = tuple(SLEEPERS)
+
+class ConfigBlock(ctypes.Structure):
+    _fields_ = [
+        ("seq", ctypes.c_uint64),
+        ("ack", ctypes.c_uint64),
+        ("mode", ctypes.c_uint8),
+        ("rand", ctypes.c_uint8),
+        ("assist_wtap", ctypes.c_uint8),
+        ("assist_blockhit", ctypes.c_uint8),
+        ("sleeper", ctypes.c_uint8),
+        ("target_btn", ctypes.c_int32),
+        ("cps_left", ctypes.c_double),
+        ("cps_right", ctypes.c_double),
+        ("jitter", ctypes.c_double),
+        ("assist_wtap_chance", ctypes.c_double),
+        ("assist_blockhit_chance", ctypes.c_double),
+        ("spin_tail_us", ctypes.c_double),
+        ("rt_profile", ctypes.c_uint8),
+        ("rt_cpu", ctypes.c_int32),
+        ("rt_priority", ctypes.c_int32),
+        ("precision_left", ctypes.c_uint8),
+        ("precision_right", ctypes.c_uint8),
+        ("precision_overrun", ctypes.c_uint8),
+        ("precision_hz_left", ctypes.c_double),
+        ("precision_hz_right", ctypes.c_double),
+        ("engine_triggers", ctypes.c_uint8),
+        ("trigger_mode", ctypes.c_uint8),
+        ("trigger_left", ctypes.c_int32),
+        ("trigger_right", ctypes.c_int32),
+    ]
+
+CONFIG_FIELDS = {
+    'mode': lambda v: MODES.index(v) if v in MODES else 0,
+    'rand': int,
+    'assist_wtap': bool,
+    'assist_blockhit': bool,
+    'sleeper': lambda v: SLEEPER_NAMES.index(v) if v in SLEEPER_NAMES else 0,
+    'target_btn': int,
+    'cps_left': float,
+    'cps_right': float,
+    'jitter': float,
+    'assist_wtap_chance': float,
+    'assist_blockhit_chance': float,
+    'spin_tail_us': lambda v: -1.0 if v is None else float(v),
+    'rt_profile': bool,
+    'rt_cpu': int,
+    'rt_priority': int,
+    'precision_left': bool,
+    'precision_right': bool,
+    'precision_overrun': lambda v: OVERRUN_POLICIES.index(v) if v in OVERRUN_POLICIES else 0,
+    'precision_hz_left': float,
+    'precision_hz_right': float,
+    'engine_triggers': bool,
+    'trigger_mode': lambda v: TRIGGER_MODES.index(v) if v in TRIGGER_MODES else 0,
+    'trigger_left': int,
+    'trigger_right': int,
+}
+
+def convert_config(cfg):
+    # Raises ValueError/TypeError on a bad value; unknown keys are skipped.
+    return [(key, CONFIG_FIELDS[key](val)) for key, val in cfg.items() if key in CONFIG_FIELDS]
+
+class MappedSegment:
+    # Attaches to a segment another process created and owns. SharedMemory(name=...) would register
+    # it with this process's resource tracker, which starts a tracker process and unlinks the
+    # segment when this process exits.
+    def __init__(self, name):
+        self.name = name
+        fd = os.open(os.path.join("/dev/shm", name.lstrip("/")), os.O_RDWR)
+        try:
+            self.mm = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+        self.buf = memoryview(self.mm)
+
+    def close(self):
+        self.buf.release()
+        self.mm.close()
+
+    def unlink(self):
+        pass
+
+def open_shm(name=None, size=0):
+    if name is not None: return MappedSegment(name)
+    from multiprocessing import shared_memory
+    return shared_memory.SharedMemory(create=True, size=size)
+
+class SharedConfig:
+    def __init__(self, name=None):
+        self.shm = open_shm(name, ctypes.sizeof(ConfigBlock))
+        self.block = ConfigBlock.from_buffer(self.shm.buf)
+        if name is None:
+            # Fields no config mentions must still mean "default", not zero.
+            self.block.spin_tail_us = -1.0
+            self.block.rt_cpu = -1
+
+    def write(self, cfg):
+        # Single writer seqlock: seq is odd while fields are being changed.
+        # Returns True when the engine had caught up and needs a doorbell.
+        # Conversion happens before seq goes odd, so a bad value can't leave the lock held.
+        fields = convert_config(cfg)
+        block = self.block
+        prev = block.seq
+        block.seq = prev + 1
+        for key, val in fields:
+            setattr(block, key, val)
+        block.seq = prev + 2
+        return block.ack == prev
+
+    def read(self):
+        block = self.block
+        while True:
+            seq = block.seq
+            if seq == block.ack: return None
+            if seq & 1: continue
+            snap = ConfigBlock.from_buffer_copy(self.shm.buf)
+            if block.seq != seq: continue
+            block.ack = seq
+            if block.seq == seq: return snap
+
+    def close(self):
+        self.block = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+def percentile(ordered, pct):
+    if not ordered: return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+class TelemetryRing:
+    # Header: [head, capacity, engine status flags, reserved, overruns left, overruns right] as u64,
+    # then capacity records of (scheduled, written, channel, kind) doubles.
+    # Only the engine writes.
+    HEADER = 48
+    FIELDS = 4
+
+    def __init__(self, name=None, capacity=4096):
+        if name is None:
+            if capacity & (capacity - 1): raise ValueError("capacity must be a power of two")
+            size = self.HEADER + capacity * self.FIELDS * 8
+            self.shm = open_shm(size=size)
+            self.shm.buf[:self.HEADER].cast('Q')[1] = capacity
+        else:
+            self.shm = open_shm(name)
+        self.head = self.shm.buf[:self.HEADER].cast('Q')
+        self.capacity = self.head[1]
+        self.slots = self.shm.buf[self.HEADER:self.HEADER + self.capacity * self.FIELDS * 8].cast('d')
+        self.mask = self.capacity - 1
+        self.n = self.head[0]
+
+    def record(self, scheduled, written, channel, kind):
+        n = self.n
+        i = (n & self.mask) << 2
+        slots = self.slots
+        slots[i] = scheduled
+        slots[i + 1] = written
+        slots[i + 2] = channel
+        slots[i + 3] = kind
+        n += 1
+        self.n = n
+        self.head[0] = n
+
+    @property
+    def status(self):
+        return self.head[2]
+
+    @status.setter
+    def status(self, flags):
+        self.head[2] = flags
+
+    def set_overruns(self, channel, count):
+        self.head[4 + channel] = count
+
+    def overruns(self, channel):
+        return self.head[4 + channel]
+
+    def snapshot(self):
+        cap = self.capacity
+        head = self.head[0]
+        raw = self.slots.tolist()
+        head_after = self.head[0]
+        start = max(0, head_after - cap)
+        records = []
+        for n in range(start, head):
+            i = (n % cap) * 4
+            records.append((raw[i], raw[i + 1], int(raw[i + 2]), int(raw[i + 3])))
+        return records
+
+    def stats(self, window=2.0, since=None):
+        records = self.snapshot()
+        if not records: return {}
+        cutoff = records[-1][1] - window if since is None else since
+        result = {}
+        for channel in (0, 1):
+            lateness = []
+            presses = []
+            for scheduled, written, ch, kind in records:
+                if ch != channel or written < cutoff: continue
+                lateness.append(written - scheduled)
+                if kind == EV_PRESS: presses.append(written)
+            if not presses: continue
+            lateness.sort()
+            span = presses[-1] - presses[0]
+            result[channel] = {
+                'cps': (len(presses) - 1) / span if span > 0 else 0.0,
+                'p50': percentile(lateness, 50),
+                'p99': percentile(lateness, 99),
+                'max': lateness[-1],
+                'overruns': self.head[4 + channel],
+            }
+        return result
+
+    def close(self):
+        self.head.release()
+        self.slots.release()
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+class TriggerLatency:
+    # Trigger press -> first click, split per stage. The listener (UI or engine process) stamps
+    # [kernel time, receipt time] per channel; only the engine fills the histograms.
+    # Bins are log2 microseconds: bin 0 is < 1 us, bin k is [2^(k-1), 2^k) us.
+    STAGES = ("kernel_to_listener", "listener_to_engine", "engine_to_write", "total")
+    BINS = 24
+    STATS = 3  # count, sum, max
+
+    def __init__(self, name=None):
+        nstages = len(self.STAGES)
+        self.nd = 4 + nstages * self.STATS
+        size = self.nd * 8 + nstages * self.BINS * 8
+        self.shm = open_shm(name, size)
+        self.vals = self.shm.buf[:self.nd * 8].cast('d')
+        self.bins = self.shm.buf[self.nd * 8:size].cast('Q')
+
+    def stamp(self, channel, kernel_ts, receipt_ts):
+        self.vals[channel * 2] = kernel_ts
+        self.vals[channel * 2 + 1] = receipt_ts
+
+    def take(self, channel):
+        i = channel * 2
+        kernel, receipt = self.vals[i], self.vals[i + 1]
+        self.vals[i] = self.vals[i + 1] = 0.0
+        return kernel, receipt
+
+    def add(self, stage, sec):
+        if sec < 0: return
+        us = int(sec * 1e6)
+        base = 4 + stage * self.STATS
+        vals = self.vals
+        vals[base] += 1
+        vals[base + 1] += sec
+        if sec > vals[base + 2]: vals[base + 2] = sec
+        self.bins[stage * self.BINS + min(self.BINS - 1, us.bit_length())] += 1
+
+    def record(self, kernel, receipt, delivered, written):
+        # Stamps older than a second, or from another clock, belong to some other press.
+        if 0.0 < receipt <= delivered and delivered - receipt < 1.0:
+            if 0.0 < kernel <= receipt and receipt - kernel < 1.0:
+                self.add(0, receipt - kernel)
+                self.add(3, written - kernel)
+            self.add(1, delivered - receipt)
+        self.add(2, written - delivered)
+
+    def report(self):
+        out = {}
+        for stage, name in enumerate(self.STAGES):
+            base = 4 + stage * self.STATS
+            count = int(self.vals[base])
+            bins = list(self.bins[stage * self.BINS:(stage + 1) * self.BINS])
+            entry = {'count': count, 'bins_log2_us': bins}
+            if count:
+                entry['mean_us'] = self.vals[base + 1] / count * 1e6
+                entry['max_us'] = self.vals[base + 2] * 1e6
+                for pct in (50, 99):
+                    # Upper edge of the bin holding the percentile.
+                    need, seen = pct / 100.0 * count, 0
+                    for k, c in enumerate(bins):
+                        seen += c
+                        if seen >= need:
+                            entry[f'p{pct}_us_le'] = float(1 << k)
+                            break
+            out[name] = entry
+        return out
+
+    def dump(self, path):
+        report = self.report()
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({'clock': 'CLOCK_MONOTONIC', 'stages': report}, f, indent=2)
+        os.replace(tmp, path)
+        return report
+
+    def reset(self):
+        for i in range(4, self.nd): self.vals[i] = 0.0
+        for i in range(len(self.bins)): self.bins[i] = 0
+
+    def close(self):
+        self.vals.release()
+        self.bins.release()
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+def latency_text(report):
+    lines = []
+    for name, entry in report.items():
+        if not entry['count']: continue
+        lines.append(f"{name.replace('_', ' ')}: n {entry['count']} · mean {entry['mean_us']:.0f} µs · "
+                     f"p99 ≤ {entry['p99_us_le']:.0f} µs · max {entry['max_us']:.0f} µs")
+    return "\n".join(lines) or "No trigger presses recorded yet"
+
+class ControlChannel:
+    # Opcodes are single bytes on plain pipes: a 1-byte write is atomic from any thread and
+    # the engine drains everything pending with one non-blocking read.
+    def __init__(self):
+        self.reader, self.writer = os.pipe()
+        # Engine -> UI: channel state changes the engine made on its own (engine-side triggers).
+        self.notify_reader, self.notify_writer = os.pipe()
+        os.set_blocking(self.reader, False)
+        os.set_blocking(self.notify_reader, False)
+        os.set_blocking(self.notify_writer, False)
+        self.config = SharedConfig()
+        self.telemetry = TelemetryRing()
+        self.latency = TriggerLatency()
+
+    @classmethod
+    def attach(cls, reader, notify_writer, config, telemetry, latency):
+        # Engine side of a channel created by another process; see handles().
+        ctrl = cls.__new__(cls)
+        ctrl.reader, ctrl.writer = reader, None
+        ctrl.notify_reader, ctrl.notify_writer = None, notify_writer
+        os.set_blocking(reader, False)
+        os.set_blocking(notify_writer, False)
+        ctrl.config = SharedConfig(config)
+        ctrl.telemetry = TelemetryRing(telemetry)
+        ctrl.latency = TriggerLatency(latency)
+        return ctrl
+
+    def handles(self):
+        return {
+            'reader': self.reader, 'notify_writer': self.notify_writer,
+            'config': self.config.shm.name, 'telemetry': self.telemetry.shm.name, 'latency': self.latency.shm.name,
+        }
+
+    def release_engine_fds(self):
+        # Once the engine process holds its ends, closing ours lets each side see EOF when the other exits.
+        for attr in ('reader', 'notify_writer'):
+            os.close(getattr(self, attr))
+            setattr(self, attr, None)
+
+    def send_state(self, msg):
+        os.write(self.writer, bytes((STATE_CODES[msg],)))
+
+    def send_config(self, cfg):
+        if self.config.write(cfg):
+            os.write(self.writer, bytes((STATE_CODES["CONFIG"],)))
+
+    @staticmethod
+    def read_codes(fd):
+        while True:
+            try:
+                data = os.read(fd, 256)
+            except BlockingIOError:
+                return
+            if not data:
+                # The other end is gone.
+                yield "STOP"
+                return
+            for code in data: yield STATE_NAMES[code]
+            if len(data) < 256: return
+
+    def drain(self):
+        return self.read_codes(self.reader)
+
+    def notify(self, msg):
+        # Never blocks the engine; a UI that stopped reading just misses display updates.
+        try:
+            os.write(self.notify_writer, bytes((STATE_CODES[msg],)))
+        except BlockingIOError:
+            pass
+
+    def notifications(self):
+        return self.read_codes(self.notify_reader)
+
+    def close(self):
+        for fd in (self.reader, self.writer, self.notify_reader, self.notify_writer):
+            if fd is None: continue
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self.config.close()
+        self.config.unlink()
+        self.telemetry.close()
+        self.telemetry.unlink()
+        self.latency.close()
+        self.latency.unlink()
+
 class ClickerChannel:
-    def __init__(self, default_btn):
+    __slots__ = ("index", "active", "target_btn", "next_tick", "state", "state_end_time", "current_variance",
+                 "cps", "jitter_enabled", "jitter_strength", "human_lvl", "scheduled", "pressed", "samples", "entries",
+                 "precise", "period", "epoch", "tick", "overruns", "delivered")
+
+    def __init__(self, default_btn, index=0, seed=None):
+        self.index = index
         self.active = False
         self.target_btn = default_btn
         self.next_tick = 0.0
@@ -36,68 +678,287 @@ class ClickerChannel:
         self.jitter_strength = 2.0
         self.human_lvl = 1
 
+        self.scheduled = False
+        self.pressed = False
+
+        self.precise = False
+        self.period = 0.01
+        self.epoch = 0.0
+        self.tick = 0
+        self.overruns = 0
+        # perf_counter of the ENABLE that armed this channel, until its first press is written.
+        self.delivered = 0.0
+
+        self.samples = SamplePool(seed=seed)
+        # One reusable heap entry per event kind: [when, order, kind, channel].
+        self.entries = [[0.0, index * EV_KINDS + kind, kind, self] for kind in range(EV_KINDS)]
+
     def reset(self):
         self.next_tick = time.perf_counter()
         self.state = "cruising"
         self.state_end_time = time.perf_counter()
         self.current_variance = 0.0
+        self.anchor(self.next_tick)
+        self.overruns = 0
+        self.delivered = self.next_tick
+
+    def anchor(self, when):
+        # Precision deadlines are epoch + tick * period, never now + delay.
+        self.epoch = when
+        self.tick = 0
+
+    def set_precision(self, enabled, hz):
+        period = 1.0 / max(1.0, min(PRECISION_MAX_HZ, hz or 100.0))
+        if enabled == self.precise and period == self.period: return
+        self.precise = enabled
+        self.period = period
+        self.anchor(self.next_tick)
 
     def get_next_delay(self):
 
         now = time.perf_counter()
+        samples = self.samples
 
         if now >= self.state_end_time:
-            rand = random.random()
+            rand = samples.uniform()
 
             if rand < 0.70:
                 self.state = "cruising"
-                self.state_end_time = now + random.uniform(0.4, 1.2)
-                self.current_variance = random.uniform(-1.5, 1.5)
+                self.state_end_time = now + 0.4 + 0.8 * samples.uniform()
+                self.current_variance = -1.5 + 3.0 * samples.uniform()
 
             elif rand < 0.85:
                 self.state = "burst"
-                self.state_end_time = now + random.uniform(0.2, 0.4)
-                self.current_variance = random.uniform(4.0, 7.0)
+                self.state_end_time = now + 0.2 + 0.2 * samples.uniform()
+                self.current_variance = 4.0 + 3.0 * samples.uniform()
 
             else:
                 self.state = "tired"
-                self.state_end_time = now + random.uniform(0.3, 0.6)
-                self.current_variance = random.uniform(-6.0, -3.0)
+                self.state_end_time = now + 0.3 + 0.3 * samples.uniform()
+                self.current_variance = -6.0 + 3.0 * samples.uniform()
 
         target_cps = self.cps + self.current_variance
 
-        roughness = random.gauss(0, 1.5)
+        roughness = 1.5 * samples.normal()
         final_cps = target_cps + roughness
 
         final_cps = max(6.0, min(22.0, final_cps))
 
         return 1.0 / final_cps
 
-class GhostEngine:
+# struct input_event on 64-bit Linux: timeval, type, code, value.
+INPUT_EVENT = struct.Struct("llHHi")
+
+BASE_KEYS = (e.BTN_LEFT, e.BTN_RIGHT, e.KEY_S)
+REL_AXES = (e.REL_X, e.REL_Y)
+
+def create_uinput(keys):
+    return UInput(
+        {
+            e.EV_KEY: sorted(keys),
+            e.EV_REL: list(REL_AXES),
+        },
+        name="Moonlight HID",
+        vendor=0x1234,
+        product=0x5678,
+        version=0x1
+    )
+
+class BatchedUInputSink:
+    def __init__(self, keys=BASE_KEYS, capacity=64):
+        self.keys = set(keys)
+        start = time.perf_counter()
+        self.ui = create_uinput(self.keys)
+        self.create_ms = (time.perf_counter() - start) * 1000.0
+        self.rebuilds = 0
+        self.last_rebuild_ms = 0.0
+        self.fd = self.ui.fd
+        self.capacity = capacity
+        self.buf = bytearray(INPUT_EVENT.size * capacity)
+        self.view = memoryview(self.buf)
+        self.pack = INPUT_EVENT.pack_into
+        self.used = 0
+        self.writes = 0
+
+    def write(self, etype, code, value):
+        if self.used == self.capacity: self.flush()
+        self.pack(self.buf, self.used * INPUT_EVENT.size, 0, 0, etype, code, value)
+        self.used += 1
+
+    def syn(self):
+        self.write(e.EV_SYN, e.SYN_REPORT, 0)
+
+    def flush(self):
+        if not self.used: return
+        # uinput accepts any number of whole input_events per write().
+        os.write(self.fd, self.view[:self.used * INPUT_EVENT.size])
+        self.used = 0
+        self.writes += 1
+
+    def ensure_key(self, code):
+        # Returns whether the device can emit code. The replacement is built before the old
+        # device is closed, so a code the kernel rejects leaves the sink as it was.
+        if code in self.keys: return True
+        if not 0 <= code <= e.KEY_MAX: return False
+        self.flush()
+        start = time.perf_counter()
+        try:
+            ui = create_uinput(self.keys | {code})
+        except Exception as err:
+            print(f"Failed to add key {code} to the virtual device: {err}")
+            return False
+        self.ui.close()
+        self.ui = ui
+        self.keys.add(code)
+        self.fd = ui.fd
+        self.last_rebuild_ms = (time.perf_counter() - start) * 1000.0
+        self.rebuilds += 1
+        return True
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.view.release()
+            self.ui.close()
+
+RT_REQUESTED = 1
+RT_FIFO = 2
+RT_NICE = 4
+RT_AFFINITY = 8
+RT_MLOCK = 16
+
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+
+class RealtimeProfile:
     def __init__(self):
-        keyboard_keys = list(e.keys.keys())
-        mouse_buttons = [e.BTN_LEFT, e.BTN_RIGHT, e.BTN_MIDDLE, e.BTN_SIDE, e.BTN_EXTRA]
+        self.requested = (False, -1, 0)
+        self.status = 0
+        self.libc = load_libc()
+        try:
+            self.base_affinity = os.sched_getaffinity(0)
+        except OSError:
+            self.base_affinity = None
 
+    def apply(self, enabled, cpu=-1, priority=10):
+        if (enabled, cpu, priority) == self.requested: return self.status
+        self.requested = (enabled, cpu, priority)
+        self.revert()
+        if not enabled: return self.status
+
+        status = RT_REQUESTED
+        priority = max(1, min(99, priority))
         try:
-            self.ui = UInput(
-                {
-                    e.EV_KEY: keyboard_keys + mouse_buttons,
-                    e.EV_REL: [e.REL_X, e.REL_Y, e.REL_WHEEL],
-                },
-                name="Moonlight HID",
-                vendor=0x1234,
-                product=0x5678,
-                version=0x1
-            )
-        except PermissionError:
-            print("ROOT REQUIRED: run with sudo")
-            sys.exit(1)
+            soft, _ = resource.getrlimit(resource.RLIMIT_RTPRIO)
+            if 0 < soft < priority and os.geteuid() != 0: priority = soft
+        except (ValueError, OSError, AttributeError):
+            pass
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+            status |= RT_FIFO
+        except (PermissionError, OSError, AttributeError):
+            # No RLIMIT_RTPRIO / CAP_SYS_NICE: settle for the best nice level we may take.
+            for nice in (-20, -10, -5):
+                try:
+                    os.setpriority(os.PRIO_PROCESS, 0, nice)
+                    status |= RT_NICE
+                    break
+                except (PermissionError, OSError):
+                    continue
+
+        if cpu >= 0:
+            try:
+                os.sched_setaffinity(0, {cpu})
+                status |= RT_AFFINITY
+            except (OSError, ValueError):
+                pass
+
+        if self.libc is not None and self.libc.mlockall(MCL_CURRENT | MCL_FUTURE) == 0:
+            status |= RT_MLOCK
+
+        self.status = status
+        return status
+
+    def revert(self):
+        status = self.status
+        self.status = 0
+        if status & RT_FIFO:
+            try: os.sched_setscheduler(0, os.SCHED_OTHER, os.sched_param(0))
+            except OSError: pass
+        if status & RT_NICE:
+            try: os.setpriority(os.PRIO_PROCESS, 0, 0)
+            except OSError: pass
+        if status & RT_AFFINITY and self.base_affinity:
+            try: os.sched_setaffinity(0, self.base_affinity)
+            except OSError: pass
+        if status & RT_MLOCK and self.libc is not None:
+            self.libc.munlockall()
 
-        self.left = ClickerChannel(e.BTN_LEFT)
+def rt_status_text(flags):
+    if not flags & RT_REQUESTED: return "Off"
+    parts = [
+        "SCHED_FIFO" if flags & RT_FIFO else ("high priority" if flags & RT_NICE else "no priority boost"),
+        "pinned" if flags & RT_AFFINITY else "not pinned",
+        "memory locked" if flags & RT_MLOCK else "memory not locked",
+    ]
+    return " · ".join(parts)
+
+class RecordingSink:
+    def __init__(self, keys=BASE_KEYS, keep=True):
+        self.keys = set(keys)
+        self.rebuilds = 0
+        self.keep = keep
+        self.events = []
+        self.written = 0
+        self.syns = 0
+        self.writes = 0
+        self.pending = 0
+        self.closed = False
+
+    def ensure_key(self, code):
+        if code in self.keys: return True
+        if not 0 <= code <= e.KEY_MAX: return False
+        self.keys.add(code)
+        self.rebuilds += 1
+        return True
+
+    def write(self, etype, code, value):
+        if self.keep: self.events.append((time.perf_counter(), etype, code, value))
+        self.written += 1
+        self.pending += 1
+
+    def syn(self):
+        self.syns += 1
+        self.pending += 1
+
+    def flush(self):
+        if self.pending:
+            self.writes += 1
+            self.pending = 0
+
+    def close(self):
+        self.flush()
+        self.closed = True
+
+class GhostEngine:
+    def __init__(self, sink=None, seed=None, trace=None, trigger_devices=()):
+        if sink is None:
+            try:
+                sink = BatchedUInputSink()
+            except PermissionError:
+                print("ROOT REQUIRED: run with sudo")
+                sys.exit(1)
+        self.tracing = trace is not None
+        self.ui = TracingSink(sink, trace) if self.tracing else sink
+        self.seed = seed
+
+        self.left = ClickerChannel(e.BTN_LEFT, 0, self.child_seed(0))
         self.left.jitter_enabled = True
-        self.right = ClickerChannel(e.BTN_RIGHT)
+        self.right = ClickerChannel(e.BTN_RIGHT, 1, self.child_seed(1))
 
         self.mode = "mouse"
+        self.is_mouse = True
         self.paused = False
         self.drift_x = 0.0
         self.drift_y = 0.0
@@ -109,13 +970,29 @@ class GhostEngine:
 
         self.holding_s = False
         self.holding_rmb = False
+        self.catch_up = False
+
+        self.spin_tail_us = None
+        self.sleeper = make_sleeper(seed=self.child_seed(2))
+        self.rt = RealtimeProfile()
+        self.events = []
+        self.deferred = []
+        self.gc_guard = True
+        self.gc_held = False
+
+        self.ctrl = None
+        self.selector = None
+        self.listener = None
+        self.trigger_devices = trigger_devices
+
+    def child_seed(self, n):
+        return None if self.seed is None else self.seed * 16 + n
 
     def cleanup(self):
+        if self.tracing: self.ui.channel = CHANNEL_ENGINE
         try:
             self.ui.write(e.EV_KEY, e.BTN_LEFT, 0)
             self.ui.write(e.EV_KEY, e.BTN_RIGHT, 0)
-
-            self.ui.write(e.EV_KEY, e.KEY_W, 0)
             self.ui.write(e.EV_KEY, e.KEY_S, 0)
 
             if self.left.target_btn:
@@ -127,17 +1004,19 @@ class GhostEngine:
             self.ui.close()
         except:
             pass
+        self.sleeper.close()
 
     def apply_jitter(self, strength, human_lvl):
         if strength <= 0: return
-        if random.random() < 0.50:
+        samples = self.left.samples
+        if samples.uniform() < 0.50:
             multiplier = 1.0 if human_lvl == 1 else 2.2
             intensity = strength * multiplier
-            dx = random.gauss(0, intensity)
-            dy = random.gauss(0, intensity)
+            dx = intensity * samples.normal()
+            dy = intensity * samples.normal()
 
-            self.drift_x += random.uniform(-0.2, 0.2)
-            self.drift_y += random.uniform(-0.2, 0.2)
+            self.drift_x += -0.2 + 0.4 * samples.uniform()
+            self.drift_y += -0.2 + 0.4 * samples.uniform()
             self.drift_x = max(-2.5, min(2.5, self.drift_x))
             self.drift_y = max(-2.5, min(2.5, self.drift_y))
 
@@ -148,148 +1027,347 @@ class GhostEngine:
                 self.ui.write(e.EV_REL, e.REL_X, final_x)
                 self.ui.write(e.EV_REL, e.REL_Y, final_y)
 
-    def run(self, state_q, config_q):
-        sleeper = HighResSleeper()
+    def schedule(self, when, kind, ch):
+        entry = ch.entries[kind]
+        entry[0] = when
+        heapq.heappush(self.events, entry)
+
+    def arm(self, ch, when):
+        if ch.scheduled: return
+        ch.scheduled = True
+        self.schedule(when, EV_PRESS, ch)
+
+    def disarm(self, ch):
+        ch.active = False
+        ch.scheduled = False
+        ch.delivered = 0.0
+        # A stamp left by the press that stopped the channel must not be charged to the next start.
+        if self.ctrl is not None: self.ctrl.latency.take(ch.index)
+        if any(entry[3] is ch for entry in self.events):
+            self.events[:] = [entry for entry in self.events if entry[3] is not ch]
+            heapq.heapify(self.events)
+        self.deferred[:] = [entry for entry in self.deferred if entry[3] is not ch]
+        if ch.pressed:
+            if ch.target_btn is not None:
+                self.ui.write(e.EV_KEY, ch.target_btn, 0)
+                self.ui.syn()
+            ch.pressed = False
+
+    def release_assists(self):
+        if self.holding_s:
+            self.ui.write(e.EV_KEY, e.KEY_S, 0)
+            self.ui.syn()
+            self.holding_s = False
+        if self.holding_rmb:
+            self.ui.write(e.EV_KEY, e.BTN_RIGHT, 0)
+            self.ui.syn()
+            self.holding_rmb = False
+
+    def hold_gc(self):
+        # Freeze what exists and stop the cyclic collector while clicking; the loop creates no cycles.
+        busy = self.gc_guard and (self.left.active or self.right.active)
+        if busy == self.gc_held: return
+        self.gc_held = busy
+        if busy:
+            gc.freeze()
+            gc.disable()
+        else:
+            gc.unfreeze()
+            gc.enable()
+
+    def set_target(self, ch, btn):
+        if btn == ch.target_btn: return
+        if ch.pressed and ch.target_btn is not None:
+            self.ui.write(e.EV_KEY, ch.target_btn, 0)
+            self.ui.syn()
+            ch.pressed = False
+        # A key the device can't emit leaves the channel with no target, as target_btn=-1 does.
+        if btn is not None and not self.ui.ensure_key(btn): btn = None
+        ch.target_btn = btn
 
+    def apply_config(self, cfg):
+        mode = MODES[cfg.mode]
+        if mode != self.mode:
+            self.mode = mode
+            self.is_mouse = mode == 'mouse'
+            if self.is_mouse and self.right.active: self.arm(self.right, time.perf_counter())
+        if self.is_mouse:
+            self.set_target(self.left, e.BTN_LEFT)
+            self.set_target(self.right, e.BTN_RIGHT)
+        else:
+            self.set_target(self.left, None if cfg.target_btn == -1 else cfg.target_btn)
+
+        self.left.cps = cfg.cps_left
+        self.right.cps = cfg.cps_right
+        self.left.jitter_strength = cfg.jitter
+        self.left.human_lvl = cfg.rand
+        self.right.human_lvl = cfg.rand
+
+        # Mode gates folded in here so fire_press only tests booleans.
+        self.wtap_enabled = self.is_mouse and bool(cfg.assist_wtap)
+        self.wtap_chance = cfg.assist_wtap_chance / 100.0
+        self.blockhit_enabled = self.is_mouse and bool(cfg.assist_blockhit)
+        self.blockhit_chance = cfg.assist_blockhit_chance / 100.0
+        self.left.jitter_enabled = self.is_mouse
+
+        self.left.set_precision(bool(cfg.precision_left), cfg.precision_hz_left)
+        self.right.set_precision(bool(cfg.precision_right), cfg.precision_hz_right)
+        self.catch_up = OVERRUN_POLICIES[cfg.precision_overrun] == "catchup"
+
+        name = SLEEPER_NAMES[cfg.sleeper]
+        tail = None if cfg.spin_tail_us < 0 else cfg.spin_tail_us
+        if name != self.sleeper.name or tail != self.spin_tail_us:
+            self.sleeper.close()
+            self.sleeper = make_sleeper(name, tail, self.child_seed(2))
+            self.spin_tail_us = tail
+
+        self.rt.apply(bool(cfg.rt_profile), cfg.rt_cpu, cfg.rt_priority)
+
+        if bool(cfg.engine_triggers) != (self.listener is not None): self.set_engine_triggers(bool(cfg.engine_triggers))
+        if self.listener is not None:
+            listener = self.listener
+            if cfg.trigger_left != listener.trigger_left: listener.set_binding('trigger_left', cfg.trigger_left)
+            if cfg.trigger_right != listener.trigger_right: listener.set_binding('trigger_right', cfg.trigger_right)
+            if TRIGGER_MODES[cfg.trigger_mode] != listener.mode_trigger: listener.set_trigger_mode(TRIGGER_MODES[cfg.trigger_mode])
+            if mode != listener.mode_app: listener.set_app_mode(mode)
+
+    def set_engine_triggers(self, enabled):
+        # The engine reads the trigger devices itself; the UI only hears about it afterwards.
+        if enabled:
+            self.listener = GlobalListener(
+                toggle_cb=self.on_trigger_toggle,
+                start_cb=lambda channel: self.trigger_state("ENABLE_" + channel.upper()),
+                stop_cb=lambda channel: self.trigger_state("DISABLE_" + channel.upper()),
+                rebind_cb=None,
+                toggle_gui_cb=None,
+                initial_app_mode=self.mode,
+                handle_hide=False,
+                devices=self.trigger_devices,
+                probe=self.ctrl.latency
+            )
+            self.listener.open()
+            self.listener.is_paused = self.paused
+            self.selector.register(self.listener.fileno(), selectors.EVENT_READ, self.listener)
+        else:
+            self.selector.unregister(self.listener.fileno())
+            self.listener.close()
+            self.listener = None
+
+    def on_trigger_toggle(self, channel):
+        ch = self.left if channel == 'left' else self.right
+        self.trigger_state(("DISABLE_" if ch.active else "ENABLE_") + channel.upper())
+
+    def trigger_state(self, msg):
+        self.apply_state(msg)
         try:
-            while True:
-                while not config_q.empty():
-                    cfg = config_q.get()
-                    if 'mode' in cfg:
-                        self.mode = cfg['mode']
-                        if self.mode == 'mouse':
-                            self.left.target_btn = e.BTN_LEFT
-                            self.right.target_btn = e.BTN_RIGHT
-                    if 'cps_left' in cfg: self.left.cps = float(cfg['cps_left'])
-                    if 'cps_right' in cfg: self.right.cps = float(cfg['cps_right'])
-                    if 'jitter' in cfg: self.left.jitter_strength = float(cfg['jitter'])
-                    if 'rand' in cfg:
-                        self.left.human_lvl = int(cfg['rand'])
-                        self.right.human_lvl = int(cfg['rand'])
-                    if 'target_btn' in cfg:
-                        if self.mode == 'keyboard':
-                            val = int(cfg['target_btn'])
-                            self.left.target_btn = None if val == -1 else val
-
-                    if 'assist_wtap' in cfg: self.wtap_enabled = bool(cfg['assist_wtap'])
-                    if 'assist_wtap_chance' in cfg: self.wtap_chance = float(cfg['assist_wtap_chance']) / 100.0
-                    if 'assist_blockhit' in cfg: self.blockhit_enabled = bool(cfg['assist_blockhit'])
-                    if 'assist_blockhit_chance' in cfg: self.blockhit_chance = float(cfg['assist_blockhit_chance']) / 100.0
-
-                while not state_q.empty():
-                    msg = state_q.get()
-                    if msg == "STOP":
-                        return
-                    if msg == "PAUSE": self.paused = True
-                    if msg == "RESUME": self.paused = False
-
-                    if msg == "ENABLE_LEFT":
-                        if not self.left.active:
-                            self.left.active = True
-                            self.left.reset()
-                            self.drift_x = 0.0
-                            self.drift_y = 0.0
-                    elif msg == "DISABLE_LEFT":
-                        self.left.active = False
-                        if self.holding_s:
-                            self.ui.write(e.EV_KEY, e.KEY_S, 0)
-                            self.ui.syn()
-                            self.holding_s = False
-                        if self.holding_rmb:
-                            self.ui.write(e.EV_KEY, e.BTN_RIGHT, 0)
-                            self.ui.syn()
-                            self.holding_rmb = False
-
-                    if msg == "ENABLE_RIGHT":
-                        if not self.right.active:
-                            self.right.active = True
-                            self.right.reset()
-                    elif msg == "DISABLE_RIGHT":
-                        self.right.active = False
-
-                if self.paused:
-                    time.sleep(0.05)
-                    continue
+            self.ctrl.notify(msg)
+        except OSError:
+            pass
 
-                now = time.perf_counter()
-                if not self.left.active and not self.right.active:
-                    time.sleep(0.01)
-                    continue
+    def apply_state(self, msg):
+        if msg == "STOP":
+            return False
+        if msg == "PAUSE":
+            self.paused = True
+            if self.listener is not None: self.listener.set_paused(True)
+        if msg == "RESUME":
+            self.paused = False
+            if self.listener is not None: self.listener.set_paused(False)
+            now = time.perf_counter()
+            for entry in self.deferred:
+                if entry[0] < now:
+                    entry[0] = now
+                    # A pause is not an overrun; fixed-rate channels restart their grid.
+                    if entry[3].precise:
+                        entry[3].next_tick = now
+                        entry[3].anchor(now)
+                heapq.heappush(self.events, entry)
+            self.deferred.clear()
 
-                processed_something = False
+        if msg == "ENABLE_LEFT":
+            if not self.left.active:
+                self.left.active = True
+                self.left.reset()
+                self.drift_x = 0.0
+                self.drift_y = 0.0
+                self.arm(self.left, self.left.next_tick)
+        elif msg == "DISABLE_LEFT":
+            self.disarm(self.left)
+            self.release_assists()
 
-                if self.left.active and now >= self.left.next_tick:
-                    if self.mode == 'mouse' and self.left.jitter_enabled:
-                        self.apply_jitter(self.left.jitter_strength, self.left.human_lvl)
+        if msg == "ENABLE_RIGHT":
+            if not self.right.active:
+                self.right.active = True
+                self.right.reset()
+                if self.is_mouse: self.arm(self.right, self.right.next_tick)
+        elif msg == "DISABLE_RIGHT":
+            self.disarm(self.right)
+        self.hold_gc()
+        return True
 
-                    do_blockhit = (self.mode == 'mouse' and self.blockhit_enabled and random.random() < self.blockhit_chance)
-                    do_wtap = (self.mode == 'mouse' and self.wtap_enabled and random.random() < self.wtap_chance)
+    def fire_press(self, ch, now):
+        ch.scheduled = False
+        is_left = ch.index == 0
+        if not is_left and not self.is_mouse:
+            return
+        if ch.precise:
+            self.fire_tick(ch, now)
+            return
 
-                    if self.left.target_btn is not None:
-                        self.ui.write(e.EV_KEY, self.left.target_btn, 1)
-                        self.ui.syn()
+        do_blockhit = False
+        do_wtap = False
+        if is_left:
+            if ch.jitter_enabled:
+                self.apply_jitter(ch.jitter_strength, ch.human_lvl)
 
-                    if do_blockhit:
-                        self.holding_rmb = True
-                        self.ui.write(e.EV_KEY, e.BTN_RIGHT, 1)
-                        self.ui.syn()
+            do_blockhit = self.blockhit_enabled and ch.samples.uniform() < self.blockhit_chance
+            do_wtap = self.wtap_enabled and ch.samples.uniform() < self.wtap_chance
 
-                    if do_wtap:
-                        self.holding_s = True
-                        self.ui.write(e.EV_KEY, e.KEY_S, 1)
-                        self.ui.syn()
+        if ch.target_btn is not None:
+            self.ui.write(e.EV_KEY, ch.target_btn, 1)
+            self.ui.syn()
+        ch.pressed = True
 
-                    hold = max(0.022, min(0.15, random.lognormvariate(-3.2, 0.25)))
+        if do_blockhit:
+            self.holding_rmb = True
+            self.ui.write(e.EV_KEY, e.BTN_RIGHT, 1)
+            self.ui.syn()
 
-                    full_delay = self.left.get_next_delay()
+        if do_wtap:
+            self.holding_s = True
+            self.ui.write(e.EV_KEY, e.KEY_S, 1)
+            self.ui.syn()
 
-                    self.left.next_tick = now + full_delay
+        hold = ch.samples.hold()
+        full_delay = ch.get_next_delay()
 
-                    sleeper.sleep_until(now + hold)
+        release_at = now + hold
+        self.schedule(release_at, EV_RELEASE, ch)
 
-                    if self.left.target_btn is not None:
-                        self.ui.write(e.EV_KEY, self.left.target_btn, 0)
-                        self.ui.syn()
+        last_up = release_at
+        if do_blockhit:
+            last_up += 0.01 + 0.02 * ch.samples.uniform()
+            self.schedule(last_up, EV_BLOCKHIT_UP, ch)
+        if do_wtap:
+            last_up += 0.01 + 0.01 * ch.samples.uniform()
+            self.schedule(last_up, EV_WTAP_UP, ch)
 
-                    if do_blockhit:
-                        time.sleep(random.uniform(0.01, 0.03))
-                        self.ui.write(e.EV_KEY, e.BTN_RIGHT, 0)
-                        self.ui.syn()
-                        self.holding_rmb = False
+        # A channel never presses again before its own releases have landed.
+        ch.next_tick = max(now + full_delay, last_up)
+        self.arm(ch, ch.next_tick)
 
-                    if do_wtap:
-                        time.sleep(random.uniform(0.01, 0.02))
-                        self.ui.write(e.EV_KEY, e.KEY_S, 0)
-                        self.ui.syn()
-                        self.holding_s = False
+    def fire_tick(self, ch, now):
+        if ch.target_btn is not None:
+            self.ui.write(e.EV_KEY, ch.target_btn, 1)
+            self.ui.syn()
+        ch.pressed = True
 
-                    processed_something = True
+        period = ch.period
+        late = now - ch.next_tick
+        ch.tick += 1
+        if late >= period:
+            if self.catch_up:
+                ch.overruns += 1
+            else:
+                missed = int(late / period)
+                ch.tick += missed
+                ch.overruns += missed
 
-                now = time.perf_counter()
-                if self.mode == 'mouse' and self.right.active and now >= self.right.next_tick:
-                    self.ui.write(e.EV_KEY, self.right.target_btn, 1)
+        release_at = now + min(period * PRECISION_DUTY, HOLD_MAX)
+        self.schedule(release_at, EV_RELEASE, ch)
+        # Catching up never overlaps a press with the previous release.
+        ch.next_tick = max(ch.epoch + ch.tick * period, release_at)
+        self.arm(ch, ch.next_tick)
+
+    def fire(self, kind, ch, now):
+        if kind == EV_PRESS:
+            self.fire_press(ch, now)
+        elif kind == EV_RELEASE:
+            if ch.pressed:
+                if ch.target_btn is not None:
+                    self.ui.write(e.EV_KEY, ch.target_btn, 0)
                     self.ui.syn()
+                ch.pressed = False
+        elif kind == EV_BLOCKHIT_UP:
+            if self.holding_rmb:
+                self.ui.write(e.EV_KEY, e.BTN_RIGHT, 0)
+                self.ui.syn()
+                self.holding_rmb = False
+        elif kind == EV_WTAP_UP:
+            if self.holding_s:
+                self.ui.write(e.EV_KEY, e.KEY_S, 0)
+                self.ui.syn()
+                self.holding_s = False
 
-                    hold = max(0.022, min(0.15, random.lognormvariate(-3.2, 0.25)))
-                    full_delay = self.right.get_next_delay()
+    def record_trigger(self, ch):
+        written = time.perf_counter()
+        kernel, receipt = self.ctrl.latency.take(ch.index)
+        self.ctrl.latency.record(kernel, receipt, ch.delivered, written)
+        ch.delivered = 0.0
 
-                    self.right.next_tick = now + full_delay
-                    sleeper.sleep_until(now + hold)
+    def refill_pools(self):
+        for samples in (self.left.samples, self.right.samples, self.sleeper.samples):
+            if samples.needs_refill(): samples.refill()
 
-                    self.ui.write(e.EV_KEY, self.right.target_btn, 0)
-                    self.ui.syn()
-                    processed_something = True
+    def run(self, ctrl):
+        events = self.events
+        telemetry = ctrl.telemetry
+        selector = selectors.DefaultSelector()
+        selector.register(ctrl.reader, selectors.EVENT_READ)
+        self.ctrl = ctrl
+        self.selector = selector
+        ctrl.notify("READY")
+
+        try:
+            while True:
+                timeout = None
+                if events:
+                    timeout = max(0.0, events[0][0] - time.perf_counter() - WAKE_LEAD)
+                if timeout is None or timeout > REFILL_SLACK:
+                    self.refill_pools()
+                    if events: timeout = max(0.0, events[0][0] - time.perf_counter() - WAKE_LEAD)
 
-                if not processed_something:
-                    next_event = 9999999999.0
-                    if self.left.active: next_event = min(next_event, self.left.next_tick)
-                    if self.mode == 'mouse' and self.right.active: next_event = min(next_event, self.right.next_tick)
-                    rem = next_event - time.perf_counter()
-                    if rem > 0.001: time.sleep(min(rem, 0.05))
+                ready = selector.select(timeout)
+                if ready:
+                    if self.tracing: self.ui.channel = CHANNEL_ENGINE
+                    for key, _ in ready:
+                        if key.data is not None: key.data.poll(0)
+                    for msg in ctrl.drain():
+                        if msg == "CONFIG":
+                            cfg = ctrl.config.read()
+                            if cfg is not None:
+                                self.apply_config(cfg)
+                                telemetry.status = self.rt.status
+                        elif not self.apply_state(msg):
+                            return
+                    self.ui.flush()
+                    continue
+
+                if not events: continue
+                entry = events[0]
+                when, _, kind, ch = entry
+                self.sleeper.sleep_until(when, ch.precise)
+                heapq.heappop(events)
+
+                if self.paused and kind == EV_PRESS:
+                    self.deferred.append(entry)
+                    continue
+
+                now = time.perf_counter()
+                if self.tracing: self.ui.channel = ch.index
+                self.fire(kind, ch, now)
+                self.ui.flush()
+                telemetry.record(when, now, ch.index, kind)
+                if ch.delivered and kind == EV_PRESS: self.record_trigger(ch)
+                if ch.precise: telemetry.set_overruns(ch.index, ch.overruns)
 
         except KeyboardInterrupt:
             pass
         except Exception as err:
             print(f"Engine Error: {err}")
         finally:
+            if self.listener is not None: self.set_engine_triggers(False)
+            selector.close()
+            self.gc_guard = False
+            self.hold_gc()
             self.cleanup()
@@ -1,8 +1,90 @@
+import os
+import errno
 import evdev
+import fcntl
 import select
+import struct
+import ctypes
+import ctypes.util
 import threading
 import time
 
+INPUT_DIR = "/dev/input"
+
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+IN_ATTRIB = 0x004
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_ADDED = IN_CREATE | IN_MOVED_TO | IN_ATTRIB
+IN_REMOVED = IN_DELETE | IN_MOVED_FROM
+
+# struct inotify_event: wd, mask, cookie, len, then len bytes of name.
+INOTIFY_EVENT = struct.Struct("iIII")
+
+# struct input_event on 64-bit Linux: timeval, type, code, value.
+INPUT_EVENT = struct.Struct("llHHi")
+READ_EVENTS = 64
+
+EV_SYN = evdev.ecodes.EV_SYN
+EV_KEY = evdev.ecodes.EV_KEY
+EV_CNT = 0x20
+KEY_CNT = 0x300
+
+# struct input_mask: type, codes_size, codes_ptr. _IOW('E', 0x93, struct input_mask)
+INPUT_MASK = struct.Struct("IIQ")
+EVIOCSMASK = (1 << 30) | (INPUT_MASK.size << 16) | (ord('E') << 8) | 0x93
+# _IOW('E', 0xa0, int): stamp events with CLOCK_MONOTONIC, the clock perf_counter reads.
+EVIOCSCLOCKID = (1 << 30) | (4 << 16) | (ord('E') << 8) | 0xa0
+CLOCK_MONOTONIC = 1
+
+def set_event_mask(fd, codes):
+    # Per-client kernel filter: only EV_KEY events for `codes` (all keys for None, nothing
+    # for an empty set) are queued. Motion-only packets never wake the reader at all.
+    types = 0 if codes is not None and not codes else (1 << EV_SYN) | (1 << EV_KEY)
+    type_bits = ctypes.create_string_buffer(struct.pack("I", types), EV_CNT // 8)
+    fcntl.ioctl(fd, EVIOCSMASK, INPUT_MASK.pack(0, EV_CNT // 8, ctypes.addressof(type_bits)))
+    if not types: return
+    bits = bytearray(b"\xff" * (KEY_CNT // 8) if codes is None else KEY_CNT // 8)
+    if codes is not None:
+        for code in codes:
+            if 0 <= code < KEY_CNT: bits[code >> 3] |= 1 << (code & 7)
+    key_bits = ctypes.create_string_buffer(bytes(bits), len(bits))
+    fcntl.ioctl(fd, EVIOCSMASK, INPUT_MASK.pack(EV_KEY, KEY_CNT // 8, ctypes.addressof(key_bits)))
+
+class InputWatch:
+    def __init__(self, path=INPUT_DIR):
+        self.path = path
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, path.encode(), IN_ADDED | IN_REMOVED) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, f"cannot watch {path}")
+
+    def read(self):
+        # Yields (added, path) for event nodes; IN_ATTRIB also counts as added since
+        # udev fixes up permissions just after the node appears.
+        try:
+            data = os.read(self.fd, 4096)
+        except BlockingIOError:
+            return
+        pos = 0
+        while pos < len(data):
+            _, mask, _, size = INOTIFY_EVENT.unpack_from(data, pos)
+            pos += INOTIFY_EVENT.size
+            name = data[pos:pos + size].rstrip(b"\0").decode(errors="replace")
+            pos += size
+            if name.startswith("event"):
+                yield not mask & IN_REMOVED, os.path.join(self.path, name)
+
+    def close(self):
+        os.close(self.fd)
+
 class GlobalListener:
     def __init__(
         self,
@@ -13,7 +95,11 @@ class GlobalListener:
         toggle_gui_cb,
         initial_keys=None,
         initial_mode="toggle",
-        initial_app_mode="mouse"
+        initial_app_mode="mouse",
+        handle_triggers=True,
+        handle_hide=True,
+        devices=(),
+        probe=None
     ):
         if initial_keys is None: initial_keys = {}
         self.trigger_left = initial_keys.get('left', 64)
@@ -39,7 +125,30 @@ class GlobalListener:
 
         self.stop_event = threading.Event()
         self.rebind_mode = None
-        self.devices = []
+        self.devices = {}
+        self.caps = {}
+        self.armed = set()
+        self.masking = True
+        self.poller = None
+        self.watch = None
+        # Nodes we opened once and will never read (our own device, no keys at all).
+        self.ignored = set()
+        self.fingerprints = {}
+        self.wake_r, self.wake_w = os.pipe()
+        os.set_blocking(self.wake_r, False)
+        self.watch_fd = -1
+        # Already-open devices (e.g. handed over by a parent process) that scan() would not find.
+        self.extra_devices = list(devices)
+
+        self.handle_triggers = handle_triggers
+        self.handle_hide = handle_hide
+        # Optional TriggerLatency: stamped with the kernel and receipt time of each starting press.
+        self.probe = probe
+        self.event_ts = 0.0
+        self.receipt_ts = 0.0
+        self.dispatch = {}
+        self.bound = frozenset()
+        self.rebuild_dispatch()
 
     def get_nice_name(self, code: int) -> str:
         if code == evdev.ecodes.BTN_LEFT: return "Left Click"
@@ -56,13 +165,43 @@ class GlobalListener:
         except:
             return "Unknown"
 
+    def rebuild_dispatch(self):
+        # code -> ((handler, channel, is_mouse_button), ...); rebuilt only when bindings or modes change.
+        handler = self.on_toggle if self.mode_trigger == 'toggle' else self.on_hold
+        mouse_btns = (evdev.ecodes.BTN_LEFT, evdev.ecodes.BTN_RIGHT)
+        table = {}
+        for channel, code in (('left', self.trigger_left), ('right', self.trigger_right)):
+            if not self.handle_triggers: break
+            if self.mode_app == 'keyboard' and channel == 'right': continue
+            table[code] = table.get(code, ()) + ((handler, channel, code in mouse_btns),)
+        if self.handle_hide: table[self.hide_key] = ((self.on_hide, None, False),)
+        self.dispatch = table
+        self.bound = frozenset(table)
+
+    def set_binding(self, mode, code):
+        if mode == 'trigger_left': self.trigger_left = code
+        elif mode == 'trigger_right': self.trigger_right = code
+        elif mode == 'hide': self.hide_key = code
+        self.rebuild_dispatch()
+        self.wake()
+
+    def set_trigger_handling(self, enabled):
+        if enabled == self.handle_triggers: return
+        self.stop_all()
+        self.handle_triggers = enabled
+        self.rebuild_dispatch()
+        self.wake()
+
     def set_app_mode(self, mode):
         self.mode_app = mode
         self.stop_all()
+        self.rebuild_dispatch()
+        self.wake()
 
     def set_trigger_mode(self, mode):
         self.mode_trigger = mode
         self.stop_all()
+        self.rebuild_dispatch()
 
     def set_paused(self, paused: bool):
         self.is_paused = paused
@@ -80,6 +219,7 @@ class GlobalListener:
 
     def start_rebind(self, mode):
         self.rebind_mode = mode
+        self.wake()
 
     def start(self):
         t = threading.Thread(target=self._loop, daemon=True)
@@ -87,109 +227,274 @@ class GlobalListener:
 
     def stop(self):
         self.stop_event.set()
+        self.wake()
 
-    def _loop(self):
-        while not self.stop_event.is_set():
-            if not self.devices:
-                self.devices = [d for d in [evdev.InputDevice(path) for path in evdev.list_devices()] if "Moonlight HID" not in d.name]
-                if not self.devices:
-                    time.sleep(0.5)
+    def wake(self):
+        # Device filters are only touched from the listener thread; other threads ask it to refresh.
+        try:
+            os.write(self.wake_w, b"\0")
+        except OSError:
+            pass
+
+    def key_caps(self, dev):
+        # Replugging the same hardware skips the capability ioctls.
+        info = dev.info
+        fp = (info.bustype, info.vendor, info.product, info.version, dev.name, dev.phys)
+        keys = self.fingerprints.get(fp)
+        if keys is None:
+            keys = frozenset(dev.capabilities().get(evdev.ecodes.EV_KEY, ()))
+            self.fingerprints[fp] = keys
+        return keys
+
+    def add_device(self, path):
+        if path in self.ignored or any(d.path == path for d in self.devices.values()): return None
+        try:
+            dev = evdev.InputDevice(path)
+            keys = self.key_caps(dev)
+            if "Moonlight HID" in dev.name or not keys:
+                self.ignored.add(path)
+                dev.close()
+                return None
+        except OSError:
+            return None
+        return self.attach(dev, keys)
+
+    def attach(self, dev, keys=None):
+        if keys is None: keys = self.key_caps(dev)
+        try:
+            fcntl.ioctl(dev.fd, EVIOCSCLOCKID, struct.pack("i", CLOCK_MONOTONIC))
+        except OSError:
+            pass
+        self.devices[dev.fd] = dev
+        self.caps[dev.fd] = keys
+        if not self.update_device(dev.fd, None if self.rebind_mode else self.bound): return None
+        return dev
+
+    def remove_device(self, fd):
+        dev = self.devices.pop(fd, None)
+        if dev is None: return
+        self.caps.pop(fd, None)
+        if fd in self.armed:
+            self.armed.discard(fd)
+            try:
+                self.poller.unregister(fd)
+            except (OSError, ValueError):
+                pass
+        try:
+            dev.close()
+        except OSError:
+            pass
+
+    def update_device(self, fd, wanted):
+        # wanted is None while rebinding (every key counts), else the bound codes.
+        keys = self.caps[fd] if wanted is None else self.caps[fd] & wanted
+        if self.masking:
+            try:
+                set_event_mask(fd, None if wanted is None else keys)
+            except OSError as e:
+                if e.errno in (errno.ENOTTY, errno.EINVAL):
+                    # The kernel has no EVIOCSMASK; filter in userspace from now on.
+                    self.masking = False
+                else:
+                    # Only this node is broken (typically ENODEV after an unplug).
+                    self.remove_device(fd)
+                    return False
+        if keys and fd not in self.armed:
+            # Anything queued while the device was parked is stale.
+            try:
+                while os.read(fd, INPUT_EVENT.size * READ_EVENTS): pass
+            except OSError:
+                pass
+            self.poller.register(fd, select.EPOLLIN)
+            self.armed.add(fd)
+        elif not keys and fd in self.armed:
+            self.poller.unregister(fd)
+            self.armed.discard(fd)
+        return True
+
+    def refresh(self):
+        wanted = None if self.rebind_mode else self.bound
+        for fd in list(self.devices): self.update_device(fd, wanted)
+
+    def scan(self):
+        known = {dev.path for dev in self.devices.values()}
+        for path in evdev.list_devices():
+            if path not in known: self.add_device(path)
+
+    def hotplug(self):
+        for added, path in self.watch.read():
+            if added:
+                self.add_device(path)
+            else:
+                self.ignored.discard(path)
+                for fd, dev in list(self.devices.items()):
+                    if dev.path == path: self.remove_device(fd)
+
+    def read_device(self, fd, mask):
+        if fd not in self.devices: return
+        if mask & (select.EPOLLERR | select.EPOLLHUP):
+            self.remove_device(fd)
+            return
+        try:
+            data = os.read(fd, INPUT_EVENT.size * READ_EVENTS)
+            self.receipt_ts = time.perf_counter()
+        except BlockingIOError:
+            return
+        except OSError:
+            # Unplugged or revoked: drop just this node, the rest keep streaming.
+            self.remove_device(fd)
+            return
+        try:
+            dispatch = self.dispatch
+            for sec, usec, etype, code, val in INPUT_EVENT.iter_unpack(data):
+                if etype != EV_KEY: continue
+                self.event_ts = sec + usec * 1e-6
+                if self.rebind_mode and val == 1:
+                    self.handle_rebind(code)
+                    dispatch = self.dispatch
                     continue
+                entries = dispatch.get(code)
+                if entries is None: continue
+                for handler, channel, is_mouse_phys in entries:
+                    handler(channel, val, is_mouse_phys)
+        except Exception:
+            pass
+
+    def handle_rebind(self, code):
+        if code == evdev.ecodes.KEY_ESC:
+            old_code = -1
+            old_name = "Select Key..."
+
+            if self.rebind_mode == 'trigger_left': old_code = self.trigger_left
+            elif self.rebind_mode == 'trigger_right': old_code = self.trigger_right
+            elif self.rebind_mode == 'hide': old_code = self.hide_key
+
+            if old_code != -1: old_name = self.get_nice_name(old_code)
+
+            self.rebind_cb(old_name, old_code, self.rebind_mode)
+            self.rebind_mode = None
+            self.refresh()
+            return
+
+        if self.rebind_mode in ['hide', 'trigger_left', 'trigger_right'] and code in [evdev.ecodes.BTN_LEFT, evdev.ecodes.BTN_RIGHT]:
+            return
+
+        if self.rebind_mode in ['trigger_left', 'trigger_right'] and code == self.hide_key:
+            return
+
+        if self.rebind_mode == 'hide' and (code == self.trigger_left or code == self.trigger_right):
+            return
+
+        nice = self.get_nice_name(code)
+
+        if self.rebind_mode == 'trigger_left':
+            self.trigger_left = code
+            self.rebind_cb(nice, code, 'trigger_left')
+        elif self.rebind_mode == 'trigger_right':
+            self.trigger_right = code
+            self.rebind_cb(nice, code, 'trigger_right')
+        elif self.rebind_mode == 'target':
+            self.rebind_cb(nice, code, 'target')
+        elif self.rebind_mode == 'hide':
+            self.hide_key = code
+            self.rebind_cb(nice, code, 'hide')
 
-            try:
-                r, _, _ = select.select(self.devices, [], [], 0.5)
-                for dev in r:
-                    for event in dev.read():
-                        if event.type != evdev.ecodes.EV_KEY: continue
-                        val, code = event.value, event.code
-
-                        if self.rebind_mode and val == 1:
-
-                            if code == evdev.ecodes.KEY_ESC:
-                                old_code = -1
-                                old_name = "Select Key..."
-
-                                if self.rebind_mode == 'trigger_left': old_code = self.trigger_left
-                                elif self.rebind_mode == 'trigger_right': old_code = self.trigger_right
-                                elif self.rebind_mode == 'hide': old_code = self.hide_key
-
-                                if old_code != -1: old_name = self.get_nice_name(old_code)
-
-                                self.rebind_cb(old_name, old_code, self.rebind_mode)
-                                self.rebind_mode = None
-                                continue
-
-                            if self.rebind_mode in ['hide', 'trigger_left', 'trigger_right'] and code in [evdev.ecodes.BTN_LEFT, evdev.ecodes.BTN_RIGHT]:
-                                continue
-
-                            if self.rebind_mode in ['trigger_left', 'trigger_right'] and code == self.hide_key:
-                                continue
-
-                            if self.rebind_mode == 'hide' and (code == self.trigger_left or code == self.trigger_right):
-                                continue
-
-                            nice = self.get_nice_name(code)
-
-                            if self.rebind_mode == 'trigger_left':
-                                self.trigger_left = code
-                                self.rebind_cb(nice, code, 'trigger_left')
-                            elif self.rebind_mode == 'trigger_right':
-                                self.trigger_right = code
-                                self.rebind_cb(nice, code, 'trigger_right')
-                            elif self.rebind_mode == 'target':
-                                self.rebind_cb(nice, code, 'target')
-                            elif self.rebind_mode == 'hide':
-                                self.hide_key = code
-                                self.rebind_cb(nice, code, 'hide')
-
-                            self.rebind_mode = None
-                            continue
-
-                        if code == self.hide_key and val == 1:
-                            self.gui_visible = not self.gui_visible
-                            self.toggle_gui_cb(self.gui_visible)
-                            continue
-
-                        if self.is_paused: continue
-
-                        def process_trigger(t_code, channel):
-                            if self.mode_app == 'keyboard' and channel == 'right':
-                                return
-
-                            if code == t_code:
-                                is_mouse_phys = (code in [evdev.ecodes.BTN_LEFT, evdev.ecodes.BTN_RIGHT])
-
-                                if self.mode_trigger == 'toggle':
-                                    if val == 1: self.toggle_cb(channel)
-
-                                elif self.mode_trigger == 'hold':
-                                    if val == 1:
-                                        if channel == 'left' and not self.holding_left:
-                                            self.holding_left = True
-                                            if is_mouse_phys: self.pending_left_mouse = True
-                                            else: self.start_cb('left')
-                                        if channel == 'right' and not self.holding_right:
-                                            self.holding_right = True
-                                            if is_mouse_phys: self.pending_right_mouse = True
-                                            else: self.start_cb('right')
-
-                                    elif val == 0:
-                                        if channel == 'left' and self.holding_left:
-                                            self.holding_left = False
-                                            if self.pending_left_mouse: self.pending_left_mouse = False
-                                            else: self.stop_cb('left')
-                                        if channel == 'right' and self.holding_right:
-                                            self.holding_right = False
-                                            if self.pending_right_mouse: self.pending_right_mouse = False
-                                            else: self.stop_cb('right')
-
-                                    if val == 0:
-                                        if channel == 'left' and self.pending_left_mouse:
-                                            self.pending_left_mouse = False
-                                            self.start_cb('left')
-
-                        process_trigger(self.trigger_left, 'left')
-                        process_trigger(self.trigger_right, 'right')
-
-            except Exception:
-                self.devices = []
+        self.rebind_mode = None
+        self.rebuild_dispatch()
+        self.refresh()
+
+    def start_channel(self, cb, channel):
+        if self.probe is not None: self.probe.stamp(0 if channel == 'left' else 1, self.event_ts, self.receipt_ts)
+        cb(channel)
+
+    def on_hide(self, channel, val, is_mouse_phys):
+        if val == 1:
+            self.gui_visible = not self.gui_visible
+            self.toggle_gui_cb(self.gui_visible)
+
+    def on_toggle(self, channel, val, is_mouse_phys):
+        if self.is_paused: return
+        if val == 1: self.start_channel(self.toggle_cb, channel)
+
+    def on_hold(self, channel, val, is_mouse_phys):
+        if self.is_paused: return
+        if val == 1:
+            if channel == 'left' and not self.holding_left:
+                self.holding_left = True
+                if is_mouse_phys: self.pending_left_mouse = True
+                else: self.start_channel(self.start_cb, 'left')
+            if channel == 'right' and not self.holding_right:
+                self.holding_right = True
+                if is_mouse_phys: self.pending_right_mouse = True
+                else: self.start_channel(self.start_cb, 'right')
+
+        elif val == 0:
+            if channel == 'left' and self.holding_left:
+                self.holding_left = False
+                if self.pending_left_mouse: self.pending_left_mouse = False
+                else: self.stop_cb('left')
+            if channel == 'right' and self.holding_right:
+                self.holding_right = False
+                if self.pending_right_mouse: self.pending_right_mouse = False
+                else: self.stop_cb('right')
+
+        if val == 0:
+            if channel == 'left' and self.pending_left_mouse:
+                self.pending_left_mouse = False
+                self.start_channel(self.start_cb, 'left')
+
+    def open(self):
+        self.poller = select.epoll()
+        self.poller.register(self.wake_r, select.EPOLLIN)
+        try:
+            self.watch = InputWatch()
+            self.poller.register(self.watch.fd, select.EPOLLIN)
+        except OSError as e:
+            print(f"Input hotplug unavailable ({e}), falling back to rescans")
+            self.watch = None
+        self.watch_fd = self.watch.fd if self.watch else -1
+        self.scan()
+        for dev in self.extra_devices: self.attach(dev)
+
+    def fileno(self):
+        # The epoll fd is itself pollable, so another event loop can wait on the whole listener.
+        return self.poller.fileno()
+
+    def poll(self, timeout):
+        if not self.devices and self.watch is None: self.scan()
+        for fd, mask in self.poller.poll(timeout):
+            if fd == self.watch_fd:
+                self.hotplug()
+            elif fd == self.wake_r:
+                try:
+                    while os.read(self.wake_r, 64): pass
+                except BlockingIOError:
+                    pass
+                self.refresh()
+            else:
+                self.read_device(fd, mask)
+
+    def close(self):
+        self.stop_all()
+        for fd in list(self.devices): self.remove_device(fd)
+        if self.watch: self.watch.close()
+        self.watch = None
+        self.poller.close()
+        # -1 makes a late wake() fail harmlessly instead of hitting a reused fd.
+        for fd in (self.wake_r, self.wake_w):
+            try: os.close(fd)
+            except OSError: pass
+        self.wake_r = self.wake_w = -1
+
+    def _loop(self):
+        self.open()
+        try:
+            while not self.stop_event.is_set():
+                if not self.devices and self.watch is None:
+                    self.scan()
+                    if not self.devices:
+                        time.sleep(0.5)
+                        continue
+                self.poll(0.5)
+        finally:
+            self.close()
@@ -1,9 +1,11 @@
+import time
+STARTUP_T0 = time.perf_counter()
+
 import sys
 import os
-import multiprocessing
-import signal
-import ctypes
-import json
+import hashlib
+import threading
+import subprocess
 import gi
 
 gi.require_version('Gtk', '4.0')
@@ -11,85 +13,69 @@ gi.require_version('Adw', '1')
 from gi.repository import Gtk, Adw, Gdk, GLib
 
 from ui_builder import MainWindow
-from ghost_core import GhostEngine
+from ghost_core import ControlChannel, rt_status_text, latency_text
 from input_listener import GlobalListener
-from managers import PresetManager
-
-CONFIG_DIR = os.path.expanduser("~/.config/Moonlight")
-CONFIG_FILE = os.path.join(CONFIG_DIR, "config.json")
-
-DEFAULT_CONFIG = {
-    'cps_left': 12.0,
-    'cps_right': 12.0,
-    'jitter': 2.0,
-    'rand': 1,
-    'mode': 'mouse',
-    'target_btn': -1,
-    'trigger_mode': 'toggle',
-    'trigger_left': 64,
-    'trigger_right': 65,
-    'hide_key': 54,
-    'assist_wtap': False,
-    'assist_wtap_chance': 5.0,
-    'assist_blockhit': False,
-    'assist_blockhit_chance': 5.0
-}
-
-def mask_process():
-    try:
-        libc = ctypes.cdll.LoadLibrary('libc.so.6')
-        name = b"kworker/u12:0"
-        libc.prctl(15, name, 0, 0, 0)
-    except Exception:
-        pass
+from managers import PresetManager, ConfigWriter, CONFIG_DIR, CONFIG_FILE, DEFAULT_CONFIG, load_config
+from engine_main import mask_process, engine_command
+
+LATENCY_FILE = os.path.join(CONFIG_DIR, "latency.json")
+ICON_STAMP = os.path.join(CONFIG_DIR, "icon.sha256")
+ICON_THEME_DIR = os.path.expanduser("~/.local/share/icons/hicolor")
+
 
 def install_app_icon():
+    # Only rewrites the icon and its cache when icon.svg changed since the last install.
     try:
-        icon_dir = os.path.expanduser("~/.local/share/icons/hicolor/scalable/apps")
-        os.makedirs(icon_dir, exist_ok=True)
-
+        icon_dir = os.path.join(ICON_THEME_DIR, "scalable", "apps")
         dest_path = os.path.join(icon_dir, "com.moonlight.final.svg")
         source_path = os.path.join(os.path.dirname(__file__), "icon.svg")
 
-        if os.path.exists(source_path):
-            with open(source_path, "r") as src:
-                icon_content = src.read()
-            with open(dest_path, "w") as dest:
-                dest.write(icon_content)
-
-            os.system("gtk4-update-icon-cache -f -t " + os.path.expanduser("~/.local/share/icons/hicolor/"))
-        else:
+        if not os.path.exists(source_path):
             print("Warning: icon.svg not found. Taskbar icon may be missing.")
+            return
+
+        with open(source_path, "rb") as src:
+            icon_content = src.read()
+        digest = hashlib.sha256(icon_content).hexdigest()
+        try:
+            with open(ICON_STAMP, "r") as f:
+                if f.read().strip() == digest and os.path.exists(dest_path): return
+        except OSError:
+            pass
 
+        os.makedirs(icon_dir, exist_ok=True)
+        with open(dest_path, "wb") as dest:
+            dest.write(icon_content)
+        subprocess.run(["gtk4-update-icon-cache", "-f", "-t", ICON_THEME_DIR],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        os.makedirs(CONFIG_DIR, exist_ok=True)
+        with open(ICON_STAMP, "w") as f:
+            f.write(digest)
     except Exception as e:
         print(f"Icon installation warning: {e}")
 
-def backend_proc(state_q, config_q):
-    mask_process()
-    signal.signal(signal.SIGINT, signal.SIG_IGN)
-    eng = GhostEngine()
-    eng.run(state_q, config_q)
-
 class MoonlightApp(Adw.Application):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
-        install_app_icon()
-
         self.connect('activate', self.on_activate)
         self.connect('shutdown', self.on_shutdown)
 
-        self.state_q = multiprocessing.Queue()
-        self.config_q = multiprocessing.Queue()
+        self.ctrl = ControlChannel()
 
-        self.proc = multiprocessing.Process(target=backend_proc, args=(self.state_q, self.config_q))
-        self.proc.daemon = True
-        self.proc.start()
+        # The engine runs as its own lean interpreter rather than a fork of this GTK process.
+        self.proc = subprocess.Popen(engine_command(self.ctrl.handles()),
+                                     pass_fds=(self.ctrl.reader, self.ctrl.notify_writer))
+        self.ctrl.release_engine_fds()
+
+        threading.Thread(target=install_app_icon, daemon=True).start()
 
         self.active_left = False
         self.active_right = False
 
         self.config = self.load_config()
+        self.config_writer = ConfigWriter(CONFIG_FILE)
         self.preset_mgr = PresetManager(CONFIG_DIR, DEFAULT_CONFIG)
 
         self.theme_provider = Gtk.CssProvider()
@@ -98,29 +84,17 @@ class MoonlightApp(Adw.Application):
             self.theme_provider,
             Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION + 10
         )
+        self.theme_css = {}
+        self.theme_key = None
+        self.theme_pending = False
 
         mask_process()
 
     def load_config(self):
-        if not os.path.exists(CONFIG_DIR):
-            os.makedirs(CONFIG_DIR, exist_ok=True)
-
-        cfg = DEFAULT_CONFIG.copy()
-        if os.path.exists(CONFIG_FILE):
-            try:
-                with open(CONFIG_FILE, 'r') as f:
-                    saved = json.load(f)
-                    cfg.update(saved)
-            except Exception as e:
-                print(f"Failed to load config: {e}")
-        return cfg
+        return load_config(CONFIG_DIR)
 
     def save_config(self):
-        try:
-            with open(CONFIG_FILE, 'w') as f:
-                json.dump(self.config, f, indent=4)
-        except Exception as e:
-            print(f"Failed to save config: {e}")
+        self.config_writer.save(self.config)
 
     def on_activate(self, app):
         self.hold()
@@ -149,11 +123,14 @@ class MoonlightApp(Adw.Application):
                 'hide': self.config.get('hide_key', 54)
             },
             initial_mode=self.config.get('trigger_mode', 'toggle'),
-            initial_app_mode=self.config.get('mode', 'mouse')
+            initial_app_mode=self.config.get('mode', 'mouse'),
+            handle_triggers=not self.config.get('engine_triggers', False),
+            probe=self.ctrl.latency
         )
         self.listener.start()
+        GLib.io_add_watch(self.ctrl.notify_reader, GLib.PRIORITY_DEFAULT, GLib.IO_IN, self.on_engine_notify)
 
-        self.config_q.put(self.config)
+        self.ctrl.send_config(self.config)
 
         self.win = MainWindow(
             app,
@@ -164,9 +141,47 @@ class MoonlightApp(Adw.Application):
             self.config,
             self.preset_mgr,
             self.handle_theme_change,
-            self.handle_preset_action
+            self.handle_preset_action,
+            self.latency_report
         )
         self.win.present()
+        # Only bench.py startup asks for the time to first window; it quits once that is known.
+        clock = self.win.get_frame_clock() if os.environ.get("MOONLIGHT_STARTUP_EXIT") else None
+        if clock: self.first_paint_id = clock.connect("after-paint", self.on_first_paint)
+
+        GLib.timeout_add(500, self.poll_telemetry)
+
+    def on_first_paint(self, clock):
+        clock.disconnect(self.first_paint_id)
+        self.startup_ms = (time.perf_counter() - STARTUP_T0) * 1000.0
+        print(f"Startup: first window in {self.startup_ms:.0f} ms")
+        GLib.idle_add(self.quit)
+
+    def poll_telemetry(self):
+        self.win.update_engine_status(rt_status_text(self.ctrl.telemetry.status))
+        if not (self.active_left or self.active_right):
+            if self.win.lbl_telemetry.get_visible(): self.win.update_telemetry({})
+            return True
+        if self.win.get_visible():
+            self.win.update_telemetry(self.ctrl.telemetry.stats())
+        return True
+
+    def on_engine_notify(self, fd, condition):
+        for msg in self.ctrl.notifications():
+            if msg == "STOP":
+                print("Click engine exited")
+                return False
+            if msg.endswith("_LEFT"): self.active_left = msg.startswith("ENABLE")
+            elif msg.endswith("_RIGHT"): self.active_right = msg.startswith("ENABLE")
+        self.update_visuals()
+        return True
+
+    def latency_report(self):
+        try:
+            report = self.ctrl.latency.dump(LATENCY_FILE)
+        except OSError as e:
+            return f"Failed to write latency dump: {e}"
+        return f"{latency_text(report)}\nSaved to {LATENCY_FILE}"
 
     def handle_theme_change(self, key, is_custom=False, color_val=None):
         if is_custom:
@@ -176,11 +191,25 @@ class MoonlightApp(Adw.Application):
         self.refresh_dynamic_theme()
 
     def refresh_dynamic_theme(self):
+        # Coalesce theme changes into one provider reload, run before the next frame is drawn.
+        if self.theme_pending: return
+        self.theme_pending = True
+        GLib.idle_add(self.apply_dynamic_theme, priority=GLib.PRIORITY_HIGH_IDLE)
+
+    def apply_dynamic_theme(self):
+        self.theme_pending = False
         data = self.preset_mgr.get_active_theme()
-        css_str = ""
-        for key, val in data.items():
-            css_str += f"@define-color {key} {val};\n"
+        key = hash(tuple(sorted(data.items())))
+        if key == self.theme_key: return False
+
+        css_str = self.theme_css.get(key)
+        if css_str is None:
+            css_str = "".join(f"@define-color {k} {v};\n" for k, v in data.items())
+            if len(self.theme_css) >= 32: self.theme_css.pop(next(iter(self.theme_css)))
+            self.theme_css[key] = css_str
+        self.theme_key = key
         self.theme_provider.load_from_string(css_str)
+        return False
 
     def handle_preset_action(self, action, name):
         if action == "save":
@@ -193,7 +222,7 @@ class MoonlightApp(Adw.Application):
                 clean_cfg = {k:v for k,v in cfg.items() if k != '_theme_config'}
                 self.config.update(clean_cfg)
                 self.save_config()
-                self.config_q.put(clean_cfg)
+                self.ctrl.send_config(clean_cfg)
                 self.refresh_dynamic_theme()
                 return cfg
         return None
@@ -240,6 +269,8 @@ class MoonlightApp(Adw.Application):
         elif mode == 'hide': self.config['hide_key'] = code
         elif mode == 'target': self.config['target_btn'] = code
         self.save_config()
+        # Runs on the listener thread; the shared config block only takes writes from the main loop.
+        if mode in ('trigger_left', 'trigger_right'): GLib.idle_add(self.ctrl.send_config, {mode: code})
 
         if hasattr(self, 'win'):
             GLib.idle_add(self.win.update_bind_label, nice_name, code, mode)
@@ -250,23 +281,27 @@ class MoonlightApp(Adw.Application):
         GLib.idle_add(_do)
 
     def send_state(self, msg):
-        self.state_q.put(msg)
+        self.ctrl.send_state(msg)
 
     def handle_config_change(self, cfg: dict):
+        if 'engine_triggers' in cfg: self.listener.set_trigger_handling(not cfg['engine_triggers'])
         self.config.update(cfg)
         self.save_config()
-        self.config_q.put(cfg)
+        self.ctrl.send_config(cfg)
 
     def send_suspend(self, suspend: bool):
-        self.state_q.put("PAUSE" if suspend else "RESUME")
+        self.ctrl.send_state("PAUSE" if suspend else "RESUME")
 
     def on_shutdown(self, app):
-        try: self.state_q.put("STOP")
+        try: self.ctrl.send_state("STOP")
         except: pass
         try: self.listener.stop()
         except: pass
-        if self.proc.is_alive():
-            self.proc.terminate()
+        try: self.proc.wait(0.5)
+        except subprocess.TimeoutExpired: self.proc.terminate()
+        try: self.ctrl.close()
+        except: pass
+        self.config_writer.close()
 
 if __name__ == "__main__":
     sys.path.append(os.path.abspath(os.path.dirname(__file__)))
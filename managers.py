@@ -1,6 +1,8 @@
 import os
 import json
 import glob
+import threading
+from time import monotonic
 
 DEFAULT_THEMES = {
     "Moonlight": {
@@ -86,6 +88,170 @@ DEFAULT_THEMES = {
     }
 }
 
+CONFIG_DIR = os.path.expanduser("~/.config/Moonlight")
+CONFIG_FILE = os.path.join(CONFIG_DIR, "config.json")
+
+DEFAULT_CONFIG = {
+    'cps_left': 12.0,
+    'cps_right': 12.0,
+    'jitter': 2.0,
+    'rand': 1,
+    'mode': 'mouse',
+    'target_btn': -1,
+    'trigger_mode': 'toggle',
+    'trigger_left': 64,
+    'trigger_right': 65,
+    'hide_key': 54,
+    'assist_wtap': False,
+    'assist_wtap_chance': 5.0,
+    'assist_blockhit': False,
+    'assist_blockhit_chance': 5.0,
+    'sleeper': 'spin',
+    'rt_profile': False,
+    'rt_cpu': -1,
+    'rt_priority': 10,
+    'precision_left': False,
+    'precision_right': False,
+    'precision_hz_left': 100.0,
+    'precision_hz_right': 100.0,
+    'precision_overrun': 'skip',
+    'engine_triggers': False
+}
+
+def load_config(config_dir=CONFIG_DIR):
+    if not os.path.exists(config_dir):
+        os.makedirs(config_dir, exist_ok=True)
+
+    cfg = DEFAULT_CONFIG.copy()
+    path = os.path.join(config_dir, "config.json")
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                saved = json.load(f)
+                cfg.update(saved)
+        except Exception as e:
+            print(f"Failed to load config: {e}")
+    return cfg
+
+def write_json_atomic(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    try:
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+        try: os.fsync(fd)
+        finally: os.close(fd)
+    except OSError:
+        pass
+
+class ConfigWriter:
+    # Writes the config off the UI thread once changes settle.
+    # A steady stream of changes still gets written every max_delay seconds.
+    def __init__(self, path, delay=0.5, max_delay=2.0):
+        self.path = path
+        self.delay = delay
+        self.max_delay = max_delay
+        self.pending = None
+        self.first = 0.0
+        self.due = 0.0
+        self.writes = 0
+        self.running = True
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def save(self, cfg):
+        now = monotonic()
+        with self.cond:
+            if self.pending is None: self.first = now
+            self.pending = dict(cfg)
+            self.due = min(now + self.delay, self.first + self.max_delay)
+            self.cond.notify()
+
+    def close(self, timeout=2.0):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        self.thread.join(timeout)
+
+    def _loop(self):
+        while True:
+            with self.cond:
+                while self.running:
+                    if self.pending is None:
+                        self.cond.wait()
+                        continue
+                    wait = self.due - monotonic()
+                    if wait <= 0: break
+                    self.cond.wait(wait)
+                data, self.pending = self.pending, None
+            if data is None: return
+            try:
+                write_json_atomic(self.path, data)
+                self.writes += 1
+            except Exception as e:
+                print(f"Failed to save config: {e}")
+
+class JsonDir:
+    # In-memory index of a directory of JSON files. Files are only re-parsed when
+    # their mtime or size changes; unreadable files are kept with data None.
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+
+    def read(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except:
+            return None
+
+    def refresh(self):
+        seen = {}
+        try:
+            with os.scandir(self.path) as it:
+                for e in it:
+                    if not e.name.endswith(".json") or not e.is_file(): continue
+                    try: st = e.stat()
+                    except OSError: continue
+                    name = e.name[:-5]
+                    stamp = (st.st_mtime_ns, st.st_size)
+                    old = self.files.get(name)
+                    seen[name] = old if old and old[0] == stamp else (stamp, self.read(e.path))
+        except OSError:
+            pass
+        self.files = seen
+        return seen
+
+    def get(self, name):
+        path = os.path.join(self.path, f"{name}.json")
+        try: st = os.stat(path)
+        except OSError:
+            self.files.pop(name, None)
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        old = self.files.get(name)
+        if not old or old[0] != stamp:
+            old = self.files[name] = (stamp, self.read(path))
+        return old[1]
+
+    def cached(self, name):
+        entry = self.files.get(name)
+        return entry[1] if entry else None
+
+    def store(self, name, data):
+        path = os.path.join(self.path, f"{name}.json")
+        write_json_atomic(path, data)
+        st = os.stat(path)
+        self.files[name] = ((st.st_mtime_ns, st.st_size), data)
+
+    def remove(self, name):
+        self.files.pop(name, None)
+        os.remove(os.path.join(self.path, f"{name}.json"))
+
 class PresetManager:
     def __init__(self, config_dir, default_config=None):
         self.preset_dir = os.path.join(config_dir, "presets")
@@ -97,6 +263,9 @@ class PresetManager:
         if not os.path.exists(self.theme_dir):
             os.makedirs(self.theme_dir, exist_ok=True)
 
+        self.presets = JsonDir(self.preset_dir)
+        self.themes = JsonDir(self.theme_dir)
+
         self.loaded_themes = {}
         self.ensure_themes()
         self.load_all_themes()
@@ -140,14 +309,8 @@ class PresetManager:
 
     def load_all_themes(self):
         self.loaded_themes.clear()
-        files = glob.glob(os.path.join(self.theme_dir, "*.json"))
-        for fpath in files:
+        for filename, (_, data) in self.themes.refresh().items():
             try:
-                with open(fpath, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-
-                filename = os.path.basename(fpath).replace(".json", "")
-
                 if "colors" in data:
                     colors = data["colors"]
                     display_name = data.get("name", filename)
@@ -175,8 +338,7 @@ class PresetManager:
         return sorted(themes, key=lambda x: x[1])
 
     def get_presets(self):
-        files = glob.glob(os.path.join(self.preset_dir, "*.json"))
-        return sorted([os.path.basename(f).replace(".json", "") for f in files])
+        return sorted(self.presets.refresh())
 
     def save_preset(self, name, config_data, check_exists=False):
         if not name or name.strip() == "": return "empty"
@@ -190,12 +352,11 @@ class PresetManager:
         save_data = config_data.copy()
         save_data['_theme_config'] = {
             'base': self.active_theme_name,
-            'overrides': self.custom_overrides
+            'overrides': dict(self.custom_overrides)
         }
 
         try:
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(save_data, f, indent=4)
+            self.presets.store(clean_name, save_data)
             return "success"
         except:
             return "error"
@@ -208,22 +369,18 @@ class PresetManager:
             'base': "Moonlight",
             'overrides': {}
         }
-        path = os.path.join(self.preset_dir, f"{name}.json")
         try:
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(cfg, f, indent=4)
+            self.presets.store(name, cfg)
             return True
         except:
             return False
 
     def check_modification(self, name, current_cfg):
-        path = os.path.join(self.preset_dir, f"{name}.json")
-        if not os.path.exists(path): return True
+        # Compares against the index from the last get_presets() call.
+        saved = self.presets.cached(name)
+        if saved is None: return True
 
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                saved = json.load(f)
-
             for key, val in current_cfg.items():
                 if key in saved and saved[key] != val:
                     return True
@@ -252,17 +409,15 @@ class PresetManager:
         return False
 
     def load_preset(self, name):
-        path = os.path.join(self.preset_dir, f"{name}.json")
-        if os.path.exists(path):
+        data = self.presets.get(name)
+        if data is not None:
             try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-
+                data = data.copy()
                 if '_theme_config' in data:
                     t_cfg = data['_theme_config']
                     saved_base = t_cfg.get('base', "Moonlight")
                     self.set_base_theme(saved_base)
-                    self.custom_overrides = t_cfg.get('overrides', {})
+                    self.custom_overrides = dict(t_cfg.get('overrides', {}))
                 else:
                     self.set_base_theme("Moonlight")
                     self.custom_overrides = {}
@@ -274,10 +429,8 @@ class PresetManager:
 
     def delete_preset(self, name):
         if name == "Default": return
-        path = os.path.join(self.preset_dir, f"{name}.json")
-        if os.path.exists(path):
-            try: os.remove(path)
-            except: pass
+        try: self.presets.remove(name)
+        except: pass
 
     def set_base_theme(self, name):
         self.load_all_themes()
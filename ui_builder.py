@@ -15,7 +15,7 @@ MOON_SVG_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
 """
 
 class MainWindow(Adw.ApplicationWindow):
-    def __init__(self, app, backend_toggle, backend_config, backend_suspend, listener, initial_config, preset_manager, theme_cb, preset_cb):
+    def __init__(self, app, backend_toggle, backend_config, backend_suspend, listener, initial_config, preset_manager, theme_cb, preset_cb, latency_cb=None):
         super().__init__(application=app, title="Moonlight")
 
         self.set_default_size(780, 720)
@@ -28,6 +28,7 @@ class MainWindow(Adw.ApplicationWindow):
         self.preset_mgr = preset_manager
         self.theme_cb = theme_cb
         self.preset_cb = preset_cb
+        self.latency_cb = latency_cb
 
         loaded_default = self.preset_mgr.load_preset("Default")
         self.cfg = loaded_default if loaded_default else initial_config
@@ -101,8 +102,8 @@ class MainWindow(Adw.ApplicationWindow):
         self.page_home = self.build_home_page()
         self.stack.add_named(self.page_home, "home")
 
-        self.page_settings = self.build_settings_page()
-        self.stack.add_named(self.page_settings, "settings")
+        # Built on the first visit, see ensure_settings_page.
+        self.page_settings = None
 
         root.append(self.stack)
 
@@ -116,7 +117,6 @@ class MainWindow(Adw.ApplicationWindow):
         for key, val in self.preset_mgr.custom_overrides.items():
             self.theme_cb(key, is_custom=True, color_val=val)
 
-        self.refresh_color_pickers()
         self.update_logo_visuals()
 
     def refresh_ui_mode(self):
@@ -125,6 +125,7 @@ class MainWindow(Adw.ApplicationWindow):
 
         if is_mouse:
             self.row_bind_right.set_visible(True)
+            for w in self.prec_right_rows: w.set_visible(True)
             self.box_cps_right.set_visible(True)
             self.sep_cps_right.set_visible(True)
             self.box_jitter.set_visible(True)
@@ -135,6 +136,7 @@ class MainWindow(Adw.ApplicationWindow):
         else:
             self.row_target.set_visible(True)
             self.row_bind_right.set_visible(False)
+            for w in self.prec_right_rows: w.set_visible(False)
             self.box_cps_right.set_visible(False)
             self.sep_cps_right.set_visible(False)
             self.box_jitter.set_visible(False)
@@ -149,8 +151,14 @@ class MainWindow(Adw.ApplicationWindow):
         if self.stack.get_visible_child_name() == "settings":
             self.refresh_presets()
 
+    def ensure_settings_page(self):
+        if self.page_settings is None:
+            self.page_settings = self.build_settings_page()
+            self.stack.add_named(self.page_settings, "settings")
+
     def navigate_to(self, page):
         if page == "settings":
+            self.ensure_settings_page()
             self.refresh_presets()
             self.refresh_color_pickers()
 
@@ -185,8 +193,12 @@ class MainWindow(Adw.ApplicationWindow):
         self.lbl_status.set_css_classes(["h1"])
         self.lbl_sub = Gtk.Label(label="Waiting for input...", xalign=0)
         self.lbl_sub.set_css_classes(["dim"])
+        self.lbl_telemetry = Gtk.Label(label="", xalign=0)
+        self.lbl_telemetry.set_css_classes(["dim"])
+        self.lbl_telemetry.set_visible(False)
         vbox_st.append(self.lbl_status)
         vbox_st.append(self.lbl_sub)
+        vbox_st.append(self.lbl_telemetry)
         hero.append(vbox_st)
 
         self.box_master = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=0)
@@ -369,8 +381,49 @@ class MainWindow(Adw.ApplicationWindow):
         self.row_hide = self.create_bind_row("Hide Window Key", "hide", self.cfg.get('hide_key', 54))
         self.btn_hide = self.row_hide.get_last_child()
         self.card_conf.append(self.row_hide)
-        self.card_conf.set_margin_bottom(8)
         box.append(self.card_conf)
+
+        self.card_precision = self.create_card("FIXED RATE")
+        self.sw_prec = {}
+        for side, title in (('left', "Left"), ('right', "Right")):
+            row = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=12)
+            lbl = Gtk.Label(label=f"{title} Fixed Rate", xalign=0, hexpand=True)
+            sw = Gtk.Switch()
+            sw.set_active(self.cfg.get(f'precision_{side}', False))
+            sw.set_valign(Gtk.Align.CENTER)
+            sw.connect("notify::active", lambda w, p, side=side: self.update_config({f'precision_{side}': w.get_active()}))
+            row.append(lbl)
+            row.append(sw)
+            self.card_precision.append(row)
+            slider, _ = self.add_slider(self.card_precision, f"{title} Rate (Hz)", 10, 1000, self.cfg.get(f'precision_hz_{side}', 100.0), 10, lambda v, side=side: self.update_config({f'precision_hz_{side}': v}), f'precision_hz_{side}')
+            self.card_precision.append(self.create_sep())
+            self.sw_prec[side] = sw
+            if side == 'right': self.prec_right_rows = (row, slider)
+
+        row_over = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
+        lbl_over = Gtk.Label(label="When Late", xalign=0, hexpand=True)
+        self.seg_over = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=0)
+        self.seg_over.set_css_classes(["segmented-box"])
+        self.seg_over.set_homogeneous(True)
+        self.btn_over_skip = Gtk.ToggleButton(label="Skip")
+        self.btn_over_skip.set_css_classes(["segment-btn"])
+        self.btn_over_skip.set_focusable(False)
+        self.btn_over_catch = Gtk.ToggleButton(label="Catch Up")
+        self.btn_over_catch.set_css_classes(["segment-btn"])
+        self.btn_over_catch.set_group(self.btn_over_skip)
+        self.btn_over_catch.set_focusable(False)
+        is_skip = self.cfg.get('precision_overrun', 'skip') != 'catchup'
+        self.btn_over_skip.set_active(is_skip)
+        self.btn_over_catch.set_active(not is_skip)
+        self.seg_over.add_css_class("pos-left" if is_skip else "pos-right")
+        self.btn_over_skip.connect("toggled", self.on_overrun_toggled)
+        self.seg_over.append(self.btn_over_skip)
+        self.seg_over.append(self.btn_over_catch)
+        row_over.append(lbl_over)
+        row_over.append(self.seg_over)
+        self.card_precision.append(row_over)
+        self.card_precision.set_margin_bottom(8)
+        box.append(self.card_precision)
         return box
 
     def build_settings_page(self):
@@ -412,16 +465,77 @@ class MainWindow(Adw.ApplicationWindow):
         self.list_frame = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
         self.list_frame.set_css_classes(["card", "nopad", "anim-enter-delay"])
 
-        self.list_presets = Gtk.ListBox()
-        self.list_presets.set_selection_mode(Gtk.SelectionMode.NONE)
-        self.list_presets.set_css_classes(["boxed-list"])
-        self.refresh_presets()
+        # Virtualized so only the visible rows exist, however many presets there are.
+        self.preset_store = Gtk.StringList()
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.on_preset_setup)
+        factory.connect("bind", self.on_preset_bind)
 
-        self.list_frame.append(self.list_presets)
+        self.list_presets = Gtk.ListView(model=Gtk.NoSelection(model=self.preset_store), factory=factory)
+        self.list_presets.set_css_classes(["boxed-list", "preset-list"])
+
+        scroll_presets = Gtk.ScrolledWindow()
+        scroll_presets.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        scroll_presets.set_propagate_natural_height(True)
+        scroll_presets.set_max_content_height(360)
+        scroll_presets.set_child(self.list_presets)
+
+        self.list_frame.append(scroll_presets)
         box.append(self.list_frame)
 
         box.append(self.create_sep())
 
+        lbl_eng = Gtk.Label(label="ENGINE", xalign=0)
+        lbl_eng.set_css_classes(["h2"])
+        box.append(lbl_eng)
+
+        engine_card = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        engine_card.set_css_classes(["card", "anim-enter-delay"])
+
+        row_rt = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=12)
+        lbl_rt = Gtk.Label(label="Low-Latency Profile", xalign=0, hexpand=True)
+        self.sw_rt = Gtk.Switch()
+        self.sw_rt.set_active(self.cfg.get('rt_profile', False))
+        self.sw_rt.set_valign(Gtk.Align.CENTER)
+        self.sw_rt.connect("notify::active", lambda w, p: self.update_config({'rt_profile': w.get_active()}))
+        row_rt.append(lbl_rt)
+        row_rt.append(self.sw_rt)
+        engine_card.append(row_rt)
+
+        self.lbl_rt_status = Gtk.Label(label="Off", xalign=0)
+        self.lbl_rt_status.set_css_classes(["dim"])
+        engine_card.append(self.lbl_rt_status)
+        engine_card.append(self.create_sep())
+
+        row_et = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=12)
+        lbl_et = Gtk.Label(label="Engine-Side Triggers", xalign=0, hexpand=True)
+        self.sw_engine_triggers = Gtk.Switch()
+        self.sw_engine_triggers.set_active(self.cfg.get('engine_triggers', False))
+        self.sw_engine_triggers.set_valign(Gtk.Align.CENTER)
+        self.sw_engine_triggers.connect("notify::active", lambda w, p: self.update_config({'engine_triggers': w.get_active()}))
+        row_et.append(lbl_et)
+        row_et.append(self.sw_engine_triggers)
+        engine_card.append(row_et)
+        engine_card.append(self.create_sep())
+
+        row_lat = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=12)
+        lbl_lat = Gtk.Label(label="Trigger Latency", xalign=0, hexpand=True)
+        btn_lat = Gtk.Button(label="Report")
+        btn_lat.set_css_classes(["trigger-btn"])
+        btn_lat.set_focusable(False)
+        btn_lat.connect("clicked", self.on_latency_report)
+        row_lat.append(lbl_lat)
+        row_lat.append(btn_lat)
+        engine_card.append(row_lat)
+
+        self.lbl_latency = Gtk.Label(label="", xalign=0, wrap=True)
+        self.lbl_latency.set_css_classes(["dim"])
+        self.lbl_latency.set_visible(False)
+        engine_card.append(self.lbl_latency)
+
+        box.append(engine_card)
+        box.append(self.create_sep())
+
         hbox_th_h = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
         lbl_th = Gtk.Label(label="THEME GALLERY", xalign=0)
         lbl_th.set_css_classes(["h2"])
@@ -494,8 +608,6 @@ class MainWindow(Adw.ApplicationWindow):
         box.append(override_card)
         scroll.set_child(box)
 
-        self.refresh_color_pickers()
-
         return scroll
 
     def on_open_folder(self, path):
@@ -568,71 +680,69 @@ class MainWindow(Adw.ApplicationWindow):
             self.update_logo_visuals()
 
     def refresh_presets(self):
-        while child := self.list_presets.get_first_child():
-            self.list_presets.remove(child)
-
-        presets = self.preset_mgr.get_presets()
-        for p in presets:
-            row = Gtk.ListBoxRow()
-            row.set_css_classes(["boxed-row"])
-
-            if p == self.active_preset_name:
-                row.add_css_class("selected-row")
-
-            hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
-            hbox.set_margin_top(8)
-            hbox.set_margin_bottom(8)
-            hbox.set_margin_start(12)
-            hbox.set_margin_end(12)
-
-            lbl = Gtk.Label(label=p, xalign=0, hexpand=True)
-            lbl.set_css_classes(["h2-text"])
-
-            btn_save = Gtk.Button(icon_name="document-save-symbolic")
-            btn_save.set_css_classes(["icon-btn", "zoom-in-anim"])
-
-            is_modified = self.preset_mgr.check_modification(p, self.cfg)
-            if not is_modified:
-                btn_save.set_sensitive(False)
-                btn_save.set_opacity(0.3)
-            else:
-                btn_save.connect("clicked", lambda b, n=p: self.on_preset_save_existing(n))
-
-            btn_load = Gtk.Button(icon_name="media-playback-start-symbolic")
-            btn_load.set_css_classes(["icon-btn", "zoom-in-anim"])
-
-            if p == self.active_preset_name:
-                btn_load.set_sensitive(False)
-                btn_load.set_opacity(0.3)
-            else:
-                btn_load.connect("clicked", lambda b, n=p: self.on_preset_load(n))
-
-            if p == "Default":
-                btn_reset = Gtk.Button(icon_name="view-refresh-symbolic")
-                btn_reset.set_css_classes(["icon-btn", "zoom-in-anim"])
-
-                is_def_mod = self.preset_mgr.is_default_modified(self.cfg)
-                if not is_def_mod:
-                    btn_reset.set_sensitive(False)
-                    btn_reset.set_opacity(0.3)
-                else:
-                    btn_reset.connect("clicked", self.on_preset_reset)
-
-                hbox.append(lbl)
-                hbox.append(btn_save)
-                hbox.append(btn_load)
-                hbox.append(btn_reset)
-            else:
-                btn_del = Gtk.Button(icon_name="user-trash-symbolic")
-                btn_del.set_css_classes(["icon-btn", "destructive", "zoom-in-anim"])
-                btn_del.connect("clicked", lambda b, n=p: self.on_preset_delete(n))
-                hbox.append(lbl)
-                hbox.append(btn_save)
-                hbox.append(btn_load)
-                hbox.append(btn_del)
-
-            row.set_child(hbox)
-            self.list_presets.append(row)
+        if self.page_settings is None: return
+        names = self.preset_mgr.get_presets()
+        self.preset_store.splice(0, self.preset_store.get_n_items(), names)
+
+    def on_preset_setup(self, factory, item):
+        row = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
+        row.set_css_classes(["boxed-row"])
+
+        hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        hbox.set_hexpand(True)
+        hbox.set_margin_top(8)
+        hbox.set_margin_bottom(8)
+        hbox.set_margin_start(12)
+        hbox.set_margin_end(12)
+
+        lbl = Gtk.Label(xalign=0, hexpand=True)
+        lbl.set_css_classes(["h2-text"])
+
+        btn_save = Gtk.Button(icon_name="document-save-symbolic")
+        btn_save.set_css_classes(["icon-btn", "zoom-in-anim"])
+        btn_save.connect("clicked", lambda b: self.on_preset_save_existing(item.get_item().get_string()))
+
+        btn_load = Gtk.Button(icon_name="media-playback-start-symbolic")
+        btn_load.set_css_classes(["icon-btn", "zoom-in-anim"])
+        btn_load.connect("clicked", lambda b: self.on_preset_load(item.get_item().get_string()))
+
+        btn_reset = Gtk.Button(icon_name="view-refresh-symbolic")
+        btn_reset.set_css_classes(["icon-btn", "zoom-in-anim"])
+        btn_reset.connect("clicked", self.on_preset_reset)
+
+        btn_del = Gtk.Button(icon_name="user-trash-symbolic")
+        btn_del.set_css_classes(["icon-btn", "destructive", "zoom-in-anim"])
+        btn_del.connect("clicked", lambda b: self.on_preset_delete(item.get_item().get_string()))
+
+        for w in (lbl, btn_save, btn_load, btn_reset, btn_del): hbox.append(w)
+        row.append(hbox)
+        item.set_child(row)
+
+    def on_preset_bind(self, factory, item):
+        p = item.get_item().get_string()
+        row = item.get_child()
+        lbl = row.get_first_child().get_first_child()
+        btn_save = lbl.get_next_sibling()
+        btn_load = btn_save.get_next_sibling()
+        btn_reset = btn_load.get_next_sibling()
+        btn_del = btn_reset.get_next_sibling()
+
+        lbl.set_label(p)
+        is_active = p == self.active_preset_name
+        if is_active: row.add_css_class("selected-row")
+        else: row.remove_css_class("selected-row")
+
+        self.set_row_button(btn_save, self.preset_mgr.check_modification(p, self.cfg))
+        self.set_row_button(btn_load, not is_active)
+
+        is_default = p == "Default"
+        btn_reset.set_visible(is_default)
+        btn_del.set_visible(not is_default)
+        if is_default: self.set_row_button(btn_reset, self.preset_mgr.is_default_modified(self.cfg))
+
+    def set_row_button(self, btn, enabled):
+        btn.set_sensitive(enabled)
+        btn.set_opacity(1.0 if enabled else 0.3)
 
     def on_preset_save(self, btn):
         name = self.entry_preset.get_text()
@@ -755,15 +865,24 @@ class MainWindow(Adw.ApplicationWindow):
 
         if 'assist_wtap' in cfg: self.sw_wtap.set_active(cfg['assist_wtap'])
         if 'assist_blockhit' in cfg: self.sw_bh.set_active(cfg['assist_blockhit'])
+        if self.page_settings is not None:
+            if 'rt_profile' in cfg: self.sw_rt.set_active(cfg['rt_profile'])
+            if 'engine_triggers' in cfg: self.sw_engine_triggers.set_active(cfg['engine_triggers'])
+        for side, sw in self.sw_prec.items():
+            if f'precision_{side}' in cfg: sw.set_active(cfg[f'precision_{side}'])
+        if 'precision_overrun' in cfg:
+            is_skip = cfg['precision_overrun'] != 'catchup'
+            self.btn_over_skip.set_active(is_skip)
+            self.btn_over_catch.set_active(not is_skip)
 
         if 'trigger_left' in cfg:
-            self.listener.trigger_left = cfg['trigger_left']
+            self.listener.set_binding('trigger_left', cfg['trigger_left'])
             self.btn_bind_left.set_label(self.listener.get_nice_name(cfg['trigger_left']))
         if 'trigger_right' in cfg:
-            self.listener.trigger_right = cfg['trigger_right']
+            self.listener.set_binding('trigger_right', cfg['trigger_right'])
             self.btn_bind_right.set_label(self.listener.get_nice_name(cfg['trigger_right']))
         if 'hide_key' in cfg:
-            self.listener.hide_key = cfg['hide_key']
+            self.listener.set_binding('hide', cfg['hide_key'])
             self.btn_hide.set_label(self.listener.get_nice_name(cfg['hide_key']))
         if 'target_btn' in cfg:
              self.saved_target_code = cfg['target_btn']
@@ -837,6 +956,26 @@ class MainWindow(Adw.ApplicationWindow):
             self.lbl_sub.set_label("Waiting for input...")
             if not self.btn_master_off.get_active(): self.btn_master_off.set_active(True)
 
+    def update_telemetry(self, stats):
+        lines = []
+        for channel, prefix in ((0, "L"), (1, "R")):
+            s = stats.get(channel)
+            if not s: continue
+            line = f"{prefix} {s['cps']:.1f} cps · p50 {s['p50']*1000:.2f} ms · p99 {s['p99']*1000:.2f} ms · max {s['max']*1000:.2f} ms"
+            if s.get('overruns'): line += f" · {s['overruns']} overruns"
+            lines.append(line)
+        self.lbl_telemetry.set_label("\n".join(lines))
+        self.lbl_telemetry.set_visible(bool(lines))
+
+    def on_latency_report(self, btn):
+        if not self.latency_cb: return
+        self.lbl_latency.set_label(self.latency_cb())
+        self.lbl_latency.set_visible(True)
+
+    def update_engine_status(self, text):
+        if self.page_settings is None: return
+        if self.lbl_rt_status.get_label() != text: self.lbl_rt_status.set_label(text)
+
     def set_active_visuals(self, active_left, active_right):
         self.btn_master_off.handler_block_by_func(self.on_master_toggled)
         self.update_master_visuals(active_left or active_right)
@@ -872,6 +1011,16 @@ class MainWindow(Adw.ApplicationWindow):
             self.seg_trig.add_css_class("pos-right")
             self.seg_trig.remove_css_class("pos-left")
 
+    def on_overrun_toggled(self, btn):
+        is_skip = self.btn_over_skip.get_active()
+        self.update_config({'precision_overrun': 'skip' if is_skip else 'catchup'})
+        if is_skip:
+            self.seg_over.add_css_class("pos-left")
+            self.seg_over.remove_css_class("pos-right")
+        else:
+            self.seg_over.add_css_class("pos-right")
+            self.seg_over.remove_css_class("pos-left")
+
     def on_human_toggled(self, btn):
         lvl = 1 if self.btn_legit.get_active() else 2
         self.update_config({'rand': lvl})